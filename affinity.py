@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Affinities are represented as integer bitmasks over logical core indices,
+# i.e., bit i is set iff core i (${CORE[i]} in the generated scripts) is
+# part of the affinity.
+
+def cpus_to_mask(cpus):
+    mask = 0
+    for cpu in cpus:
+        mask |= (1 << cpu)
+    return mask
+
+def mask_to_cpus(mask):
+    cpus = []
+    cpu = 0
+    while mask:
+        if mask & 1:
+            cpus.append(cpu)
+        mask >>= 1
+        cpu += 1
+    return cpus
+
+def mask_weight(mask):
+    "number of cores in the affinity"
+    return bin(mask).count('1')
+
+def is_subset(mask, of):
+    return mask & ~of == 0
+
+def format_ranges(mask):
+    "compact range list such as 0-3,8,10-11"
+    ranges = []
+    cpus = mask_to_cpus(mask)
+    i = 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        if i == j:
+            ranges.append('%d' % cpus[i])
+        else:
+            ranges.append('%d-%d' % (cpus[i], cpus[j]))
+        i = j + 1
+    return ','.join(ranges)
+
+def parse_ranges(s):
+    mask = 0
+    for r in s.split(','):
+        r = r.strip()
+        if not r:
+            continue
+        if '-' in r:
+            (lo, hi) = r.split('-')
+            for cpu in xrange(int(lo), int(hi) + 1):
+                mask |= (1 << cpu)
+        else:
+            mask |= (1 << int(r))
+    return mask
+
+def parse_affinity(value):
+    """Accept an affinity in any of the supported JSON encodings:
+    a list of cores, a range list ("0-3,8"), a hex mask ("0xff"),
+    or an integer mask."""
+    if isinstance(value, (int, long)):
+        return value
+    elif isinstance(value, basestring):
+        value = value.strip()
+        if value.lower().startswith('0x'):
+            return int(value, 16)
+        else:
+            return parse_ranges(value)
+    else:
+        return cpus_to_mask(value)
+
+def get_affinity(tsk_json):
+    "the task's affinity as a bitmask of logical core indices"
+    if 'affinity' in tsk_json:
+        return parse_affinity(tsk_json['affinity'])
+    elif 'partition' in tsk_json:
+        return 1 << tsk_json['partition']
+    elif 'core' in tsk_json:
+        return 1 << tsk_json['core']
+    else:
+        # no affinity given -> default to core zero
+        return 1
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Streaming task set archives: one compact JSON record per line, each
+# holding the task set's name, its generation parameters, and its tasks.
+# Large archives are split into shards named <base>.<NNNN>.jsonl.
+
+import errno
+import json
+
+from glob import glob
+from os.path import exists
+
+def _base(fname):
+    return fname[:-len('.jsonl')] if fname.endswith('.jsonl') else fname
+
+def shard_names(fname):
+    "the files that make up the archive, in order"
+    if exists(fname):
+        return [fname]
+    return sorted(glob(_base(fname) + '.[0-9][0-9][0-9][0-9].jsonl'))
+
+def is_sharded(fname):
+    return not exists(fname) and bool(shard_names(fname))
+
+def iter_archive(fname):
+    "stream (name, data) pairs, reading one record at a time"
+    shards = shard_names(fname)
+    if not shards:
+        raise IOError(errno.ENOENT, 'No such file or directory', fname)
+    for shard in shards:
+        f = open(shard, 'r')
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            yield (data['name'], data)
+        f.close()
+
+def is_archive(fname):
+    return fname.endswith('.jsonl') or is_sharded(fname)
+
+class ArchiveWriter(object):
+    """Append task sets to a (possibly sharded) archive.
+
+    If shard_size (in bytes) is given, a new shard is started whenever the
+    current one has grown beyond it. An existing sharded archive is always
+    appended to its last shard; an existing unsharded archive cannot be
+    continued in shards.
+    """
+
+    def __init__(self, fname, shard_size=None):
+        self.fname = fname
+        self.shard_size = shard_size
+        self.sharded = bool(shard_size) or is_sharded(fname)
+        if shard_size and exists(fname):
+            raise ValueError('%s: existing archive is not sharded' % fname)
+        self.names = set(name for (name, _) in iter_archive(fname)) \
+                     if shard_names(fname) else set()
+        self.out = None
+        if self.sharded:
+            self.base = _base(fname)
+            # continue with the last shard
+            self.shard = max(len(shard_names(fname)) - 1, 0)
+        self._open()
+
+    def _current(self):
+        if self.sharded:
+            return '%s.%04d.jsonl' % (self.base, self.shard)
+        else:
+            return self.fname
+
+    def _open(self):
+        self.out = open(self._current(), 'a')
+        self.out.seek(0, 2)
+        self.size = self.out.tell()
+
+    def append(self, name, data, params=None):
+        record = dict(data)
+        record['name'] = name
+        if params is not None:
+            record['params'] = params
+        line = json.dumps(record, sort_keys=True, separators=(',', ':')) + '\n'
+        if self.shard_size and self.size and \
+           self.size + len(line) > self.shard_size:
+            self.out.close()
+            self.shard += 1
+            self._open()
+        self.out.write(line)
+        self.size += len(line)
+        self.names.add(name)
+        return self._current()
+
+    def close(self):
+        self.out.close()
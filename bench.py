@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+from __future__ import division
+
+import argparse
+import json
+import resource
+import shutil
+import sys
+import tempfile
+import types
+
+from multiprocessing import Pool
+from time import time
+
+import numpy
+
+def install_schedcat_standins():
+    """Register minimal stand-ins for the parts of SchedCAT that mktasks.py
+    uses, so that the generation pipeline can be benchmarked on hosts
+    without SchedCAT. Only the task model and the RandFixedSum fallback are
+    provided; the native APA solver is replaced by the flow-based oracle."""
+
+    from feasibility import APAFeasibility
+
+    class SporadicTask(object):
+        def __init__(self, exec_cost, period, deadline=None, id=None):
+            self.cost     = exec_cost
+            self.period   = period
+            self.deadline = period if deadline is None else deadline
+            self.id       = id
+
+        def utilization(self):
+            return self.cost / self.period
+
+    class TaskSystem(list):
+        def assign_ids(self):
+            for (i, t) in enumerate(self):
+                t.id = i + 1
+
+        def assign_ids_by_period(self):
+            for (i, t) in enumerate(sorted(self, key=lambda t: t.period)):
+                t.id = i + 1
+
+        def __iadd__(self, other):
+            self.extend(other)
+            return self
+
+    def ms2us(x):
+        return x * 1000
+
+    def StaffordRandFixedSum(n, u, nsets):
+        # Not Stafford's algorithm: uniform on the simplex, with any excess
+        # above 1 redistributed. Good enough for benchmarking.
+        x = numpy.random.dirichlet(numpy.ones(n), nsets) * u
+        for row in x:
+            while (row > 1 + 1e-12).any():
+                excess = (row[row > 1] - 1).sum()
+                row[row > 1] = 1
+                room = 1 - row
+                row += excess * room / room.sum()
+        return x
+
+    def get_native_affinities(ts):
+        return [t.affinity for t in ts]
+
+    def get_native_taskset(ts):
+        return [t.utilization() for t in ts]
+
+    def apa_implicit_deadline_feasible(utils, affinities):
+        from affinity import cpus_to_mask
+        masks = [cpus_to_mask(a) for a in affinities]
+        m = max(mask.bit_length() for mask in masks)
+        return APAFeasibility(utils, masks, m).feasible
+
+    def module(name, **attrs):
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+        if '.' in name:
+            (parent, child) = name.rsplit('.', 1)
+            setattr(sys.modules[parent], child, mod)
+        return mod
+
+    module('schedcat')
+    module('schedcat.model')
+    module('schedcat.model.tasks',
+           SporadicTask=SporadicTask, TaskSystem=TaskSystem)
+    module('schedcat.util')
+    module('schedcat.util.time', ms2us=ms2us)
+    module('schedcat.generator')
+    module('schedcat.generator.generator_emstada',
+           StaffordRandFixedSum=StaffordRandFixedSum)
+    module('schedcat.sched',
+           get_native_affinities=get_native_affinities,
+           get_native_taskset=get_native_taskset)
+    module('schedcat.sched.native',
+           apa_implicit_deadline_feasible=apa_implicit_deadline_feasible)
+
+try:
+    import schedcat.generator.generator_emstada
+    STANDINS = False
+except ImportError:
+    install_schedcat_standins()
+    STANDINS = True
+
+import mktasks
+import mkscript
+
+def run_config(config):
+    "benchmark one configuration; runs in a fresh process"
+    (m, tpc, u, apa, seq, base_seed) = config
+    n = tpc * m
+    result = dict(m=m, n=n, tasks_per_core=tpc, u=u, apa=apa, seq=seq,
+                  standins=STANDINS)
+    phases = result['phases'] = {}
+
+    oracles = []
+    make_oracle = mktasks.feasibility_oracle
+    def recording_oracle(*args):
+        oracle = make_oracle(*args)
+        oracles.append(oracle)
+        return oracle
+    mktasks.feasibility_oracle = recording_oracle
+
+    def timed(phase, fun, *args, **kargs):
+        start = time()
+        ret = fun(*args, **kargs)
+        phases[phase] = time() - start
+        return ret
+
+    mktasks.seed_rng(apa, m, n, u, seq, base=base_seed)
+    ts = timed('make_tasksets', mktasks.make_tasksets, 1, n, u * m)[0]
+    if apa == 'random':
+        timed('assign_affinities',
+              mktasks.assign_random_laminar_affinities, ts, m)
+    elif apa == 'socket':
+        sockets = 2 if m >= 2 else 1
+        timed('assign_affinities',
+              mktasks.assign_three_level_affinities, ts, m, sockets)
+    else:
+        for (i, t) in enumerate(ts):
+            t.affinity = 1 << (i % m)
+    timed('assign_priorities', mktasks.assign_arm_priorities, ts)
+    result['feasible'] = timed('is_feasible', mktasks.is_feasible, ts)
+    text = timed('to_json', mktasks.to_json, ts)
+
+    data = json.loads(text)
+    prefix = tempfile.mkdtemp()
+    try:
+        timed('generate_sh', mkscript.generate_sh, 'bench', data,
+              scheduler='LSA-FP-MP', prefix=prefix + '/')
+    finally:
+        shutil.rmtree(prefix)
+
+    result['solver_calls']   = sum(o.solver_calls for o in oracles)
+    result['prefiltered']    = sum(o.rejected for o in oracles)
+    result['num_global']     = sum(1 for t in ts
+                                   if t.affinity == (1 << m) - 1)
+    result['total_time']     = sum(phases.values())
+    # Linux reports the peak resident set size in KiB.
+    result['peak_rss_kib']   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Benchmark the task set generation and rendering paths')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        '-m', '--num-cores', type=pos_int, nargs='*', dest='ncores',
+        default=[2, 4, 8, 16, 32, 64, 128, 256],
+        help='processor counts to consider')
+    p.add_argument(
+        '-t', '--task-per-core', type=pos_int, nargs='*', dest='ntasks_per_core',
+        default=[1, 2, 5, 10, 20],
+        help='task counts to consider, relative to -m')
+    p.add_argument(
+        '-u', '--per-core-utilization', type=float, nargs='*', dest='utils',
+        default=[0.5, 0.7, 0.9],
+        help='average processor utilizations to consider')
+    p.add_argument(
+        '--apa', type=str, nargs='*', choices=['partitioned', 'random', 'socket'],
+        dest='apa_types', default=['random', 'socket'],
+        help='what sort of affinities to generate')
+    p.add_argument(
+        '-r', '--repetitions', type=pos_int, dest='repetitions', default=1,
+        help='how many task sets per configuration')
+    p.add_argument(
+        '--seed', type=int, dest='seed', default=0,
+        help='base seed from which the per-task-set seeds are derived')
+
+    p.add_argument(
+        '-o', '--output', type=str, dest='output', default=None,
+        help='append results to this file (one JSON object per line)')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    configs = []
+    for apa in options.apa_types:
+        for m in options.ncores:
+            for tpc in options.ntasks_per_core:
+                for u in options.utils:
+                    for seq in xrange(options.repetitions):
+                        configs.append((m, tpc, u, apa, seq, options.seed))
+
+    out = open(options.output, 'a') if options.output else None
+
+    if STANDINS:
+        print '# SchedCAT not found; using stand-ins.'
+    print '%-12s %4s %5s %5s %9s %9s %9s %9s %9s %8s %8s %9s' % \
+        ('apa', 'm', 'n', 'u', 'generate', 'assign', 'feasible', 'to_json',
+         'render', 'solver', 'global', 'rss[KiB]')
+
+    # One process per configuration, so that peak memory usage is
+    # attributed correctly.
+    pool = Pool(1, maxtasksperchild=1)
+    for r in pool.imap(run_config, configs):
+        ph = r['phases']
+        print '%-12s %4d %5d %5.2f %9.4f %9.4f %9.4f %9.4f %9.4f %8d %8d %9d' % \
+            (r['apa'], r['m'], r['n'], r['u'], ph['make_tasksets'],
+             ph.get('assign_affinities', 0), ph['is_feasible'], ph['to_json'],
+             ph['generate_sh'], r['solver_calls'], r['num_global'],
+             r['peak_rss_kib'])
+        sys.stdout.flush()
+        if out:
+            out.write(json.dumps(r, sort_keys=True) + '\n')
+            out.flush()
+    pool.close()
+    pool.join()
+
+    if out:
+        out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""Compact columnar container for many task sets.
+
+A container consists of a data file and an offset table (the data file's
+name plus '.idx'). The data file starts with a small header, followed by
+one record per task set:
+
+    num_tasks, mask_words, name_len   (3 x uint32)
+    name                              (name_len bytes, padded to 8 bytes)
+    cost[num_tasks]                   (uint64)
+    period[num_tasks]                 (uint64)
+    priority[num_tasks]               (int64)
+    wss[num_tasks]                    (uint64, 0 = default)
+    affinity[num_tasks][mask_words]   (uint64, least-significant word first)
+
+The offset table is a plain array of uint64 offsets of the records in the
+data file. All values are little-endian. New task sets are appended to both
+files; readers memory-map the data file and decode records on demand.
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+
+from os.path import basename, exists, dirname
+from os import makedirs
+
+from affinity import parse_affinity, format_ranges
+
+MAGIC   = 'LTSC'
+VERSION = 1
+
+FILE_HEADER   = struct.Struct('<4sI')
+RECORD_HEADER = struct.Struct('<III')
+
+def index_name(fname):
+    return fname + '.idx'
+
+def _padded(n):
+    return (n + 7) & ~7
+
+class ColumnarWriter(object):
+    "append task sets to a (possibly new) container"
+
+    def __init__(self, fname):
+        self.fname = fname
+        if not exists(fname):
+            f = open(fname, 'wb')
+            f.write(FILE_HEADER.pack(MAGIC, VERSION))
+            f.close()
+            open(index_name(fname), 'wb').close()
+        reader = ColumnarReader(fname)
+        self.names = set(name for (name, _) in reader.iter_raw())
+        reader.close()
+        self.data  = open(fname, 'ab')
+        self.index = open(index_name(fname), 'ab')
+
+    def append(self, name, data):
+        "append a task set given in the JSON layout"
+        tasks = data['tasks']
+        masks = [parse_affinity(t['affinity']) if 'affinity' in t else
+                 1 << t.get('partition', t.get('core', 0)) for t in tasks]
+        words = max([1] + [(m.bit_length() + 63) // 64 for m in masks])
+        enc   = name.encode('utf-8')
+
+        self.data.seek(0, 2)
+        offset = self.data.tell()
+        self.data.write(RECORD_HEADER.pack(len(tasks), words, len(enc)))
+        self.data.write(enc + '\0' * (_padded(len(enc)) - len(enc)))
+        self.data.write(struct.pack('<%dQ' % len(tasks),
+                                    *[t['cost'] for t in tasks]))
+        self.data.write(struct.pack('<%dQ' % len(tasks),
+                                    *[t['period'] for t in tasks]))
+        self.data.write(struct.pack('<%dq' % len(tasks),
+                                    *[t.get('priority', 0) for t in tasks]))
+        self.data.write(struct.pack('<%dQ' % len(tasks),
+                                    *[t.get('wss', 0) for t in tasks]))
+        mask_words = []
+        for m in masks:
+            for _ in xrange(words):
+                mask_words.append(m & 0xffffffffffffffff)
+                m >>= 64
+        self.data.write(struct.pack('<%dQ' % len(mask_words), *mask_words))
+        self.index.write(struct.pack('<Q', offset))
+        self.names.add(name)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+class ColumnarReader(object):
+    "memory-mapped, random-access view of a container"
+
+    def __init__(self, fname):
+        self.fname = fname
+        idx = open(index_name(fname), 'rb').read()
+        self.offsets = struct.unpack('<%dQ' % (len(idx) // 8), idx)
+
+        f = open(fname, 'rb')
+        self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        (magic, version) = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s: not a task set container' % fname)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _name(self, offset):
+        (n, words, name_len) = RECORD_HEADER.unpack_from(self.map, offset)
+        start = offset + RECORD_HEADER.size
+        return self.map[start:start + name_len].decode('utf-8')
+
+    def columns(self, i):
+        "the i-th task set as (name, cost, period, priority, wss, affinity)"
+        offset = self.offsets[i]
+        (n, words, name_len) = RECORD_HEADER.unpack_from(self.map, offset)
+        pos  = offset + RECORD_HEADER.size
+        name = self.map[pos:pos + name_len].decode('utf-8')
+        pos += _padded(name_len)
+
+        cols = []
+        for fmt in 'QQqQ':
+            cols.append(struct.unpack_from('<%d%s' % (n, fmt), self.map, pos))
+            pos += 8 * n
+        raw = struct.unpack_from('<%dQ' % (n * words), self.map, pos)
+        masks = []
+        for j in xrange(n):
+            m = 0
+            for k in reversed(xrange(words)):
+                m = (m << 64) | raw[j * words + k]
+            masks.append(m)
+
+        return (name,) + tuple(cols) + (masks,)
+
+    def __getitem__(self, i):
+        "the i-th task set as (name, data) in the JSON layout"
+        (name, cost, period, prio, wss, masks) = self.columns(i)
+        tasks = []
+        for j in xrange(len(cost)):
+            t = {
+                'id'       : j + 1,
+                'cost'     : cost[j],
+                'period'   : period[j],
+                'priority' : prio[j],
+                'affinity' : format_ranges(masks[j]),
+            }
+            if wss[j]:
+                t['wss'] = wss[j]
+            tasks.append(t)
+        return (name, {'tasks' : tasks})
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.map.close()
+
+    def iter_raw(self):
+        "iterate over (name, offset) pairs without decoding any columns"
+        for offset in self.offsets:
+            yield (self._name(offset), offset)
+
+def to_json(data):
+    return json.dumps(data, sort_keys=True, indent=4, separators=(',', ': '))
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Convert task sets between JSON files and columnar containers')
+
+    p.add_argument(
+        'container', type=str,
+        help='columnar task set container')
+    p.add_argument(
+        'files', nargs='*', type=str, metavar='input-files',
+        help='JSON task set descriptions to append to the container')
+
+    p.add_argument(
+        '-x', '--extract', action='store_true', dest='extract', default=False,
+        help='write each task set in the container to a JSON file')
+    p.add_argument(
+        '--prefix', type=str, dest='prefix', default='./',
+        help='Where to store the extracted JSON file[s]?')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    if options.extract:
+        prefix_dir = dirname(options.prefix)
+        if prefix_dir and not exists(prefix_dir):
+            makedirs(prefix_dir)
+        for (name, data) in ColumnarReader(options.container):
+            fname = options.prefix + name + '.json'
+            print '=>', fname
+            f = open(fname, 'w')
+            f.write(to_json(data))
+            f.close()
+    else:
+        out = ColumnarWriter(options.container)
+        for fname in options.files:
+            name = basename(fname).replace('.json', '')
+            if name in out.names:
+                print '=> skipped; %s exists already.' % name
+                continue
+            try:
+                out.append(name, json.load(open(fname, 'r')))
+                print '%s => %s' % (fname, options.container)
+            except IOError, err:
+                print '%s: %s' % (fname, err)
+            except ValueError, err:
+                print '%s: %s' % (fname, err)
+        out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+
+# Estimate how much tracing data an experiment will produce, before running
+# it: the number of jobs (of each task and on each core), context switches,
+# Feather-Trace overhead events, sched_trace events, and the sizes of the
+# resulting trace and sample files.
+#
+# The estimates assume that each task releases jobs strictly periodically
+# and that the jobs of a task with more than one core in its affinity are
+# spread evenly across these cores. Per job, a release (RELEASE and
+# RELEASE-LATENCY) and two scheduling decisions with a context switch each
+# (job start and completion; SCHED, SCHED2, and CXS) are traced, and
+# sched_trace records the job's release, completion, and being switched to
+# and away from once. Preemptions add to this, so these are lower bounds.
+#
+# A tracer's buffer (per core, in the kernel) is likely to overflow if its
+# reader, which competes with the real-time tasks, does not get to run
+# before the buffer has filled up.
+
+from __future__ import division
+
+import argparse
+import csv
+import sys
+
+from collections import OrderedDict, defaultdict
+from glob import glob
+from math import ceil
+from os.path import isdir, join, exists
+
+from affinity import get_affinity, mask_to_cpus, format_ranges
+
+# overhead samples (of each kind) per job
+SAMPLES_PER_JOB = OrderedDict([
+    ('RELEASE',         1),
+    ('RELEASE-LATENCY', 1),
+    ('SCHED',           2),
+    ('SCHED2',          2),
+    ('CXS',             2),
+])
+
+# Feather-Trace events per job: a start and an end timestamp per sample,
+# except for the release latency, which is a single timestamp
+FT_EVENTS_PER_JOB = 2 * sum(SAMPLES_PER_JOB.values()) - \
+                    SAMPLES_PER_JOB['RELEASE-LATENCY']
+FT_EVENT_SIZE     = 16
+
+# sched_trace records: release, switch to, switch away, and completion per
+# job, and the parameters and name of each task
+ST_EVENTS_PER_JOB  = 4
+ST_EVENTS_PER_TASK = 2
+ST_EVENT_SIZE      = 24
+
+CONTEXT_SWITCHES_PER_JOB = 2
+
+SAMPLE_SIZE = 4
+
+# defaults of CONFIG_SCHED_OVERHEAD_TRACE_SHIFT and
+# CONFIG_SCHED_TASK_TRACE_SHIFT (buffer sizes as powers of two events)
+FT_BUFFER_SHIFT = 22
+ST_BUFFER_SHIFT = 9
+
+def task_job_rates(data):
+    "expected jobs per second of each task"
+    return [1000000 / t['period'] for t in data['tasks']]
+
+def job_rates(data):
+    "expected jobs per second on each logical core"
+    rates = defaultdict(float)
+    for t in data['tasks']:
+        cpus = mask_to_cpus(get_affinity(t))
+        for cpu in cpus:
+            rates[cpu] += 1000000 / t['period'] / len(cpus)
+    return rates
+
+def estimate(data, duration):
+    "the expected trace volume of a task set run for duration seconds"
+    rates = job_rates(data)
+    job_rate = sum(rates.values())
+    max_rate = max(rates.values()) if rates else 0
+    jobs = job_rate * duration
+    est = {
+        'tasks'            : len(data['tasks']),
+        'cores'            : len(rates),
+        'jobs'             : jobs,
+        'max_core_jobs'    : max_rate * duration,
+        # expected jobs of each task, and on each core
+        'task_jobs'        : [r * duration for r in task_job_rates(data)],
+        'core_jobs'        : dict((cpu, r * duration)
+                                  for (cpu, r) in rates.iteritems()),
+        'context_switches' : CONTEXT_SWITCHES_PER_JOB * jobs,
+        'ft_events'        : FT_EVENTS_PER_JOB * jobs,
+        'st_events'        : ST_EVENTS_PER_JOB * jobs +
+                             ST_EVENTS_PER_TASK * len(data['tasks']),
+        'samples'          : sum(SAMPLES_PER_JOB.values()) * jobs,
+        # events per second on the busiest core
+        'max_core_ft_rate' : FT_EVENTS_PER_JOB * max_rate,
+        'max_core_st_rate' : ST_EVENTS_PER_JOB * max_rate,
+        'job_rate'         : job_rate,
+    }
+    est['ft_bytes']     = FT_EVENT_SIZE * est['ft_events']
+    est['st_bytes']     = ST_EVENT_SIZE * est['st_events']
+    est['sample_bytes'] = SAMPLE_SIZE * est['samples']
+    return est
+
+def overflow_risks(est, reader_delay=0.1, ft_shift=FT_BUFFER_SHIFT,
+                   st_shift=ST_BUFFER_SHIFT):
+    """the tracers whose buffers are likely to overflow on the busiest core
+    if their readers are delayed by reader_delay seconds"""
+    risks = []
+    if est['max_core_ft_rate'] * reader_delay > 1 << ft_shift:
+        risks.append('ft_trace')
+    if est['max_core_st_rate'] * reader_delay > 1 << st_shift:
+        risks.append('sched_trace')
+    return risks
+
+def min_duration(est, samples):
+    """the shortest duration (in whole seconds) that yields the given number
+    of samples of each kind of overhead"""
+    if not est['job_rate']:
+        return None
+    rarest = min(SAMPLES_PER_JOB.values())
+    return int(ceil(samples / (est['job_rate'] * rarest)))
+
+def format_size(n):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if n < 1024:
+            return '%.1f %s' % (n, unit)
+        n /= 1024
+    return '%.1f TiB' % n
+
+def summary(est, tracers=('ft_trace', 'sched_trace')):
+    "a one-line description of the estimate"
+    parts = ['~%d jobs' % est['jobs'],
+             '%d context switches' % est['context_switches']]
+    if 'ft_trace' in tracers:
+        parts.append('overheads %s' % format_size(est['ft_bytes']))
+    if 'sched_trace' in tracers:
+        parts.append('schedule %s' % format_size(est['st_bytes']))
+    return ', '.join(parts)
+
+def details(name, data, est):
+    """rows of the detailed table: the expected jobs and trace events of each
+    task and on each core of the experiment"""
+    rows = []
+    for (i, (t, jobs)) in enumerate(zip(data['tasks'], est['task_jobs'])):
+        rows.append([name, 'task', t.get('id', i + 1),
+                     format_ranges(get_affinity(t)), int(round(jobs)),
+                     int(round(FT_EVENTS_PER_JOB * jobs)),
+                     int(round(ST_EVENTS_PER_JOB * jobs)) +
+                     ST_EVENTS_PER_TASK])
+    for (cpu, jobs) in sorted(est['core_jobs'].items()):
+        rows.append([name, 'core', cpu, cpu, int(round(jobs)),
+                     int(round(FT_EVENTS_PER_JOB * jobs)),
+                     int(round(ST_EVENTS_PER_JOB * jobs))])
+    return rows
+
+def find_inputs(paths):
+    "task set files, archives, and columnar containers in the given paths"
+    inputs = []
+    for path in paths:
+        if isdir(path):
+            found = glob(join(path, '*.json')) + glob(join(path, '*.jsonl'))
+            found += [f[:-len('.idx')] for f in glob(join(path, '*.idx'))
+                      if exists(f[:-len('.idx')])]
+            inputs += sorted(found)
+        else:
+            inputs.append(path)
+    return inputs
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Estimate the trace volume of experiments')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        'paths', nargs='+', type=str, metavar='input',
+        help='task set descriptions in JSON format, columnar containers, '
+             'JSONL archives, or directories containing them')
+
+    p.add_argument(
+        '-t', '--duration', type=pos_int, dest='duration', default=10,
+        help='how long the experiments run [default: 10]')
+    p.add_argument(
+        '--samples', type=pos_int, dest='samples', default=None,
+        help='suggest the minimum duration needed to collect this many '
+             'samples of each overhead')
+    p.add_argument(
+        '--reader-delay', type=pos_int, dest='reader_delay', default=100,
+        help='how long the tracers\' readers may be kept from running, '
+             'in milliseconds [default: 100]')
+    p.add_argument(
+        '--ft-buffer-shift', type=pos_int, dest='ft_shift',
+        default=FT_BUFFER_SHIFT,
+        help='size of the per-core Feather-Trace buffers as a power of two '
+             'events [default: %d]' % FT_BUFFER_SHIFT)
+    p.add_argument(
+        '--st-buffer-shift', type=pos_int, dest='st_shift',
+        default=ST_BUFFER_SHIFT,
+        help='size of the per-core sched_trace buffers as a power of two '
+             'events [default: %d]' % ST_BUFFER_SHIFT)
+    p.add_argument(
+        '--disk-space', type=pos_int, dest='disk_space', default=None,
+        help='warn if all traces together exceed this many MiB')
+    p.add_argument(
+        '-o', '--output', type=str, dest='output', default=None,
+        help='write the table to this CSV file [default: stdout]')
+    p.add_argument(
+        '--details', type=str, dest='details', default=None,
+        help='also write the expected jobs and trace events of each task and '
+             'core to this CSV file')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    # shares the input formats with mkscript.py
+    from mkscript import load_tasksets
+
+    out = open(options.output, 'wb') if options.output else sys.stdout
+    table = csv.writer(out)
+    table.writerow(['experiment', 'tasks', 'cores', 'jobs', 'max_core_jobs',
+                    'context_switches', 'ft_events', 'ft_bytes', 'st_events',
+                    'st_bytes', 'sample_bytes', 'min_duration', 'overflow'])
+    if options.details:
+        detail_out = open(options.details, 'wb')
+        detail_table = csv.writer(detail_out)
+        detail_table.writerow(['experiment', 'kind', 'id', 'cores', 'jobs',
+                               'ft_events', 'st_events'])
+
+    total = 0
+    experiments = 0
+    at_risk = 0
+    for fname in find_inputs(options.paths):
+        try:
+            for (source, name, data) in load_tasksets(fname):
+                est = estimate(data, options.duration)
+                risks = overflow_risks(est, options.reader_delay / 1000,
+                                       options.ft_shift, options.st_shift)
+                table.writerow(
+                    [name] +
+                    [int(round(est[k])) for k in
+                     ('tasks', 'cores', 'jobs', 'max_core_jobs',
+                      'context_switches', 'ft_events', 'ft_bytes',
+                      'st_events', 'st_bytes', 'sample_bytes')] +
+                    [min_duration(est, options.samples)
+                     if options.samples else '',
+                     ' '.join(risks)])
+                if options.details:
+                    detail_table.writerows(details(name, data, est))
+                total += est['ft_bytes'] + est['st_bytes'] + est['sample_bytes']
+                experiments += 1
+                at_risk += 1 if risks else 0
+        except (IOError, ValueError, KeyError), err:
+            print >>sys.stderr, '%s: %s' % (fname, err)
+
+    if options.details:
+        detail_out.close()
+    if options.output:
+        out.close()
+        report = sys.stdout
+    else:
+        report = sys.stderr
+    print >>report, '%d experiments, %s of traces and samples in total, ' \
+        '%d likely to overflow tracer buffers.' % \
+        (experiments, format_size(total), at_risk)
+    if options.disk_space and total > options.disk_space * 1024 * 1024:
+        print >>report, 'Warning: traces exceed the available %d MiB.' % \
+            options.disk_space
+
+if __name__ == '__main__':
+    main()
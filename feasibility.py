@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+
+from __future__ import division
+
+from collections import deque
+
+import numpy
+
+from affinity import mask_to_cpus, mask_weight, is_subset
+
+# Numerical slack when comparing (floating-point) utilizations.
+EPSILON = 1e-9
+
+def laminar_parents(affinities):
+    """The affinity tree of a laminar family: maps each distinct affinity to
+    the smallest other affinity that contains it (or None for roots).
+    Returns None if the affinities are not laminar."""
+    # Build the tree top-down: the parent of a node is the smallest,
+    # previously seen node that contains any of its processors.
+    nodes  = sorted(set(affinities), key=mask_weight, reverse=True)
+    owner  = {}
+    parent = {}
+    for aff in nodes:
+        cpus   = mask_to_cpus(aff)
+        owners = set(owner.get(cpu) for cpu in cpus)
+        if len(owners) != 1:
+            # partial overlap with some larger affinity
+            return None
+        parent[aff] = owners.pop()
+        for cpu in cpus:
+            owner[cpu] = aff
+    return parent
+
+class APAFeasibility(object):
+    """Incremental feasibility oracle for implicit-deadline tasks with
+    arbitrary processor affinities (APAs).
+
+    The oracle tracks, for each candidate affinity, the total utilization of
+    the tasks confined to it, which must not exceed its number of
+    processors. If the candidates (together with the tasks' initial
+    affinities) form a laminar family, i.e., if any two of them are either
+    nested or disjoint, this condition is exact (see laminar_feasible()),
+    and a change of affinity is decided by checking the candidate's
+    ancestors in the affinity tree only.
+
+    Otherwise, a task set is APA-feasible iff each task's utilization can be
+    routed as a flow from the task to the processors in its affinity without
+    exceeding any processor's capacity of one. The oracle then also keeps
+    the current flow around, so that changing the affinity of a single task
+    only requires re-routing that task's utilization along augmenting paths,
+    rather than solving the whole problem from scratch.
+
+    Affinities are given as bitmasks (see affinity.py). Tasks can only be
+    moved to candidate affinities.
+    """
+
+    def __init__(self, utilizations, affinities, num_cpus, candidates=()):
+        self.utils      = list(utilizations)
+        self.affinities = list(affinities)
+        self.solver_calls = 0
+        self.rejected     = 0
+        self.moves        = 0
+        self._admissible  = (None, None)
+        self._indices     = {}
+
+        # Number the candidate affinities top-down (larger ones first), so
+        # that in a laminar family each node comes after its parent.
+        nodes = set(candidates)
+        nodes.update(self.affinities)
+        self.nodes = sorted(nodes, key=mask_weight, reverse=True)
+        self.index = dict((aff, k) for (k, aff) in enumerate(self.nodes))
+        self.size  = numpy.array([mask_weight(aff) for aff in self.nodes],
+                                 dtype=float)
+        parent = laminar_parents(self.nodes)
+        self.laminar = parent is not None
+        if self.laminar:
+            # roots are their own parents
+            self.parent = numpy.array(
+                [self.index[parent[aff]] if parent[aff] is not None else k
+                 for (k, aff) in enumerate(self.nodes)], dtype=int)
+
+        # per candidate affinity: total utilization of the tasks confined
+        # to it
+        self.node_load  = numpy.zeros(len(self.nodes))
+        self._ancestors = {}
+        self._cpus      = {}
+        for (u, aff) in zip(self.utils, self.affinities):
+            for k in self.ancestors(aff):
+                self.node_load[k] += u
+
+        if self.laminar:
+            self.depth = max([len(self.ancestors(aff)) for aff in self.nodes]
+                             + [1])
+            self.feasible = \
+                all(u <= 1 + EPSILON for u in self.utils) and \
+                bool((self.node_load <= self.size + EPSILON).all())
+            return
+
+        self.load  = [0.0] * num_cpus
+        # per task: processor -> share of the task's utilization
+        self.flow  = [dict() for _ in self.utils]
+        # per processor: tasks that currently route flow through it
+        self.users = [set() for _ in xrange(num_cpus)]
+        self.feasible = True
+        for i in xrange(len(self.utils)):
+            if not self._route(i, []):
+                self.feasible = False
+                break
+
+    def ancestors(self, affinity):
+        "the indices of the candidate affinities that contain the given affinity"
+        if affinity not in self._ancestors:
+            if self.laminar and affinity in self.index:
+                chain = [self.index[affinity]]
+                while self.parent[chain[-1]] != chain[-1]:
+                    chain.append(int(self.parent[chain[-1]]))
+            else:
+                chain = [k for (k, node) in enumerate(self.nodes)
+                         if is_subset(affinity, node)]
+            self._ancestors[affinity] = chain
+        return self._ancestors[affinity]
+
+    def cpus(self, affinity):
+        if affinity not in self._cpus:
+            self._cpus[affinity] = mask_to_cpus(affinity)
+        return self._cpus[affinity]
+
+    def admits(self, i, affinity):
+        """Whether moving task i to the given affinity keeps the load of each
+        candidate affinity that contains it within its number of processors.
+
+        This is necessary for feasibility and, for laminar candidate
+        families, also sufficient. It takes time linear in the number of
+        the affinity's ancestors in the candidate family.
+        """
+        u   = self.utils[i]
+        old = self.affinities[i]
+        if u > 1 + EPSILON:
+            # a task cannot execute in parallel with itself
+            return False
+        for k in self.ancestors(affinity):
+            load = self.node_load[k] + u
+            if is_subset(old, self.nodes[k]):
+                load -= u
+            if load > self.size[k] + EPSILON:
+                return False
+        return True
+
+    def admissible(self, i):
+        """which candidate affinities (by index) pass the admission test for
+        task i; only for laminar families"""
+        (key, ok) = self._admissible
+        if key == (i, self.moves):
+            return ok
+        u    = self.utils[i]
+        load = self.node_load + u
+        load[self.ancestors(self.affinities[i])] -= u
+        ok = (load <= self.size + EPSILON) & (u <= 1 + EPSILON)
+        # A node is admissible only if all of its ancestors are.
+        for _ in xrange(self.depth - 1):
+            ok &= ok[self.parent]
+        self._admissible = ((i, self.moves), ok)
+        return ok
+
+    def choices(self, i, affinities):
+        "the given affinities that pass the admission test for task i"
+        if not self.laminar:
+            return [aff for aff in affinities if self.admits(i, aff)]
+        # The same lists of candidates are passed for each task.
+        (known, idx) = self._indices.get(id(affinities), (None, None))
+        if known is not affinities:
+            idx = numpy.array([self.index[aff] for aff in affinities],
+                              dtype=int)
+            self._indices[id(affinities)] = (affinities, idx)
+        return [affinities[j]
+                for j in numpy.flatnonzero(self.admissible(i)[idx])]
+
+    def try_affinity(self, i, affinity):
+        """Change the affinity of task i if the result remains feasible.
+
+        Returns True if the change was applied; otherwise the previous
+        state is restored and False is returned.
+        """
+        if not self.admits(i, affinity):
+            self.rejected += 1
+            return False
+        old = self.affinities[i]
+        if not self.laminar:
+            self.solver_calls += 1
+            undo = []
+            for cpu in self.flow[i].keys():
+                self._set_flow(i, cpu, 0.0, undo)
+            self.affinities[i] = affinity
+            if not self._route(i, undo):
+                self.affinities[i] = old
+                for (t, cpu, value) in reversed(undo):
+                    self._set_flow(t, cpu, value, None)
+                return False
+        self.affinities[i] = affinity
+        self.moves += 1
+        u = self.utils[i]
+        for k in self.ancestors(old):
+            self.node_load[k] -= u
+        for k in self.ancestors(affinity):
+            self.node_load[k] += u
+        return True
+
+    def _set_flow(self, t, cpu, value, undo):
+        old = self.flow[t].get(cpu, 0.0)
+        if undo is not None:
+            undo.append((t, cpu, old))
+        self.load[cpu] += value - old
+        if value > EPSILON:
+            self.flow[t][cpu] = value
+            self.users[cpu].add(t)
+        else:
+            self.flow[t].pop(cpu, None)
+            self.users[cpu].discard(t)
+
+    def _route(self, i, undo):
+        demand = self.utils[i]
+        if demand > 1 + EPSILON:
+            # a task cannot execute in parallel with itself
+            return False
+        while demand > EPSILON:
+            pred, end = self._find_path(i)
+            if end is None:
+                return False
+            # determine the bottleneck along the path
+            delta = min(demand, 1 - self.load[end])
+            cpu = end
+            while True:
+                (t, prev) = pred[cpu]
+                if prev is None:
+                    break
+                delta = min(delta, self.flow[t][prev])
+                cpu = prev
+            # shift flow along the path
+            cpu = end
+            while True:
+                (t, prev) = pred[cpu]
+                self._set_flow(t, cpu, self.flow[t].get(cpu, 0.0) + delta, undo)
+                if prev is None:
+                    break
+                self._set_flow(t, prev, self.flow[t][prev] - delta, undo)
+                cpu = prev
+            demand -= delta
+        return True
+
+    def _find_path(self, i):
+        # Breadth-first search over processors. pred[cpu] = (t, prev) means
+        # that task t moves some of its flow from prev to cpu; prev is None
+        # for processors entered directly from task i.
+        pred  = {}
+        queue = deque()
+        for cpu in self.cpus(self.affinities[i]):
+            pred[cpu] = (i, None)
+            queue.append(cpu)
+        while queue:
+            cpu = queue.popleft()
+            if self.load[cpu] < 1 - EPSILON:
+                return pred, cpu
+            for t in self.users[cpu]:
+                for nxt in self.cpus(self.affinities[t]):
+                    if nxt not in pred:
+                        pred[nxt] = (t, cpu)
+                        queue.append(nxt)
+        return None, None
+
+def laminar_feasible(utilizations, affinities):
+    """Exact APA feasibility test for laminar affinity families.
+
+    If all affinities are either nested or disjoint, the task set is
+    feasible iff no task has a utilization exceeding one and, for each
+    affinity A, the tasks confined to A have a total utilization of at
+    most |A|. Returns None if the affinities are not laminar.
+    """
+    load = {}
+    for (u, aff) in zip(utilizations, affinities):
+        if u > 1 + EPSILON:
+            return False
+        load[aff] = load.get(aff, 0) + u
+
+    parent = laminar_parents(load)
+    if parent is None:
+        return None
+
+    # Accumulate the per-node loads bottom-up.
+    total = load
+    for aff in sorted(load, key=mask_weight):
+        if total[aff] > mask_weight(aff) + EPSILON:
+            return False
+        if parent[aff] is not None:
+            total[parent[aff]] += total[aff]
+    return True
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Interference profiles describe the background workload of an experiment:
+# how many cache-thrashing background tasks to run on each core and with
+# which working set size (WSS). A profile is a JSON object such as
+#
+#   {
+#       "default": {"wss": 1024, "count": 1},
+#       "sockets": {"1": {"wss": "50%", "count": 2}},
+#       "cores":   {"0": {"count": 0}},
+#       "exclude": [5, 6],
+#       "exclude_rt_cores": false
+#   }
+#
+# WSS values are either a number of 4K pages or a percentage of the
+# last-level cache of the core's socket ("50%"). Settings for a core (by
+# logical index, i.e., ${CORE[i]}) take precedence over those for its socket
+# (by physical package id), which take precedence over the default. Excluded
+# cores, and with "exclude_rt_cores" the cores that any real-time task may
+# run on, get no background tasks at all.
+
+import json
+import re
+
+PERCENT = re.compile(r'^\d+%$')
+
+def _check_spec(spec, where):
+    if not isinstance(spec, dict):
+        raise ValueError('%s: expected an object' % where)
+    for key in spec:
+        if key not in ('wss', 'count'):
+            raise ValueError('%s: unknown setting %s' % (where, key))
+    if 'wss' in spec:
+        wss = spec['wss']
+        if not ((isinstance(wss, (int, long)) and wss > 0) or
+                (isinstance(wss, basestring) and PERCENT.match(wss))):
+            raise ValueError('%s: wss must be a positive number of pages '
+                             'or a percentage of the LLC' % where)
+    if 'count' in spec:
+        if not isinstance(spec['count'], (int, long)) or spec['count'] < 0:
+            raise ValueError('%s: count must be a non-negative integer' % where)
+
+def load_profile(fname):
+    "read and validate an interference profile"
+    profile = json.load(open(fname, 'r'))
+    if not isinstance(profile, dict):
+        raise ValueError('expected an object')
+    for key in profile:
+        if key not in ('default', 'sockets', 'cores', 'exclude',
+                       'exclude_rt_cores'):
+            raise ValueError('unknown setting %s' % key)
+    _check_spec(profile.get('default', {}), 'default')
+    for group in ('sockets', 'cores'):
+        for (key, spec) in profile.get(group, {}).items():
+            if not key.isdigit():
+                raise ValueError('%s: %s is not an index' % (group, key))
+            _check_spec(spec, '%s.%s' % (group, key))
+    for core in profile.get('exclude', []):
+        if not isinstance(core, (int, long)) or core < 0:
+            raise ValueError('exclude: %s is not a core index' % core)
+    return profile
+
+def _bash_array(specs, key):
+    return ' '.join('[%s]=%s' % (k, specs[k][key])
+                    for k in sorted(specs, key=int) if key in specs[k])
+
+def background_plan(profile, rt_cores=(), default_wss=0):
+    """the values with which to fill in INTERFERENCE_WORKLOAD, given the
+    logical indices of the cores hosting real-time tasks"""
+    default = profile.get('default', {})
+    exclude = set(profile.get('exclude', []))
+    if profile.get('exclude_rt_cores'):
+        exclude.update(rt_cores)
+    cores   = profile.get('cores', {})
+    sockets = profile.get('sockets', {})
+    return dict(
+        default_wss   = default.get('wss', default_wss),
+        default_count = default.get('count', 1),
+        core_wss      = _bash_array(cores, 'wss'),
+        core_count    = _bash_array(cores, 'count'),
+        socket_wss    = _bash_array(sockets, 'wss'),
+        socket_count  = _bash_array(sockets, 'count'),
+        exclude       = ' '.join(str(c) for c in sorted(exclude)),
+    )
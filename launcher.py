@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# Launch all tasks of an experiment from a single process.
+#
+# The task manifest lists one task per line: a timeout in seconds (0 = none)
+# followed by the command line to run. Lines starting with '#' are ignored.
+# Commands are split into words like a shell would, but no other shell
+# syntax (pipes, redirections, etc.) is supported.
+#
+# The launcher forks and executes all tasks, kills each task that is still
+# running after its timeout has elapsed (measured from its launch), and
+# exits once all tasks have terminated. When it receives SIGTERM, SIGINT,
+# or SIGUSR1, it sends SIGTERM to all remaining tasks.
+
+import argparse
+import errno
+import heapq
+import os
+import shlex
+import signal
+import sys
+
+from time import time
+
+def parse_manifest(f):
+    "yield (timeout, argv) for each task in the manifest"
+    for (lineno, line) in enumerate(f):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        words = shlex.split(line)
+        try:
+            timeout = float(words[0])
+        except ValueError:
+            raise ValueError('line %d: invalid timeout: %s' % (lineno + 1, words[0]))
+        if len(words) < 2:
+            raise ValueError('line %d: no command given' % (lineno + 1))
+        yield (timeout, words[1:])
+
+def spawn(argv):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.execvp(argv[0], argv)
+        except OSError, err:
+            sys.stderr.write('%s: %s\n' % (argv[0], err))
+        os._exit(127)
+    return pid
+
+class Launcher(object):
+    def __init__(self):
+        self.running   = set()
+        self.deadlines = []
+        self.stopped   = False
+
+    def launch(self, tasks):
+        for (timeout, argv) in tasks:
+            if self.stopped:
+                break
+            pid = spawn(argv)
+            self.running.add(pid)
+            if timeout > 0:
+                heapq.heappush(self.deadlines, (time() + timeout, pid))
+
+    def kill(self, pids, sig=signal.SIGTERM):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                # already gone
+                pass
+
+    def stop(self, signum, frame):
+        self.stopped = True
+        self.deadlines = []
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        self.kill(list(self.running))
+
+    def expire(self, signum=None, frame=None):
+        "kill all tasks whose timeout has elapsed, then rearm the timer"
+        now = time()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            (_, pid) = heapq.heappop(self.deadlines)
+            if pid in self.running:
+                self.kill([pid])
+        if self.deadlines:
+            signal.setitimer(signal.ITIMER_REAL,
+                             max(self.deadlines[0][0] - now, 0.001))
+
+    def wait(self):
+        while self.running:
+            try:
+                (pid, _) = os.wait()
+            except OSError, err:
+                if err.errno == errno.EINTR:
+                    continue
+                elif err.errno == errno.ECHILD:
+                    break
+                raise
+            self.running.discard(pid)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Launch the tasks listed in a task manifest')
+
+    p.add_argument(
+        'manifest', nargs='?', type=str, default=None,
+        help='task manifest [default: read from stdin]')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    try:
+        f = open(options.manifest, 'r') if options.manifest else sys.stdin
+        tasks = list(parse_manifest(f))
+    except IOError, err:
+        print >>sys.stderr, '%s: %s' % (options.manifest, err)
+        sys.exit(1)
+    except ValueError, err:
+        print >>sys.stderr, '%s: %s' % (options.manifest or '<stdin>', err)
+        sys.exit(1)
+
+    launcher = Launcher()
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, launcher.stop)
+    signal.signal(signal.SIGALRM, launcher.expire)
+
+    launcher.launch(tasks)
+    launcher.expire()
+    launcher.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+# Capture the LITMUS^RT debug log (/dev/litmus/log) with little disturbance.
+#
+# The log is read in large chunks and written in large chunks, optionally
+# gzip-compressed (at the fastest level). With a size limit, the output is
+# kept as a ring of segment files, of which only the most recent ones are
+# retained; when capturing stops, the retained segments are concatenated
+# into the output file (concatenated gzip members are a valid gzip file).
+# Capturing stops on SIGUSR1, SIGTERM, or SIGINT, or at the end of input,
+# and ends with a report of how many bytes were captured and dropped.
+
+from __future__ import division
+
+import argparse
+import errno
+import gzip
+import os
+import signal
+import sys
+
+SEGMENTS = 8
+
+class Output(object):
+    "write to a single (possibly compressed) file"
+
+    def __init__(self, fname, compress):
+        self.fname    = fname
+        self.compress = compress
+        self.written  = 0
+        self.dropped  = 0
+        self.rotated  = 0
+        self.f        = self.open(fname)
+
+    def open(self, fname):
+        if self.compress:
+            return gzip.open(fname, 'wb', 1)
+        else:
+            return open(fname, 'wb')
+
+    def write(self, data):
+        self.f.write(data)
+        self.written += len(data)
+
+    def close(self):
+        self.f.close()
+
+class RingOutput(Output):
+    "keep only (about) the last limit bytes, in SEGMENTS segment files"
+
+    def __init__(self, fname, compress, limit):
+        self.segment_size = max(1, limit // SEGMENTS)
+        self.segments     = []
+        self.current      = 0
+        Output.__init__(self, fname, compress)
+
+    def segment_name(self, i):
+        return '%s.%04d' % (self.fname, i)
+
+    def open(self, fname):
+        self.segments.append(self.segment_name(len(self.segments) +
+                                               self.rotated))
+        return Output.open(self, self.segments[-1])
+
+    def write(self, data):
+        while data:
+            n = min(len(data), self.segment_size - self.current)
+            self.f.write(data[:n])
+            self.current += n
+            self.written += n
+            data = data[n:]
+            if self.current >= self.segment_size:
+                self.f.close()
+                if len(self.segments) == SEGMENTS:
+                    os.remove(self.segments.pop(0))
+                    self.rotated += 1
+                    self.dropped += self.segment_size
+                self.f = self.open(self.fname)
+                self.current = 0
+
+    def close(self):
+        self.f.close()
+        out = open(self.fname, 'wb')
+        for seg in self.segments:
+            f = open(seg, 'rb')
+            while True:
+                data = f.read(1 << 20)
+                if not data:
+                    break
+                out.write(data)
+            f.close()
+            os.remove(seg)
+        out.close()
+
+STOP = False
+
+def stop(signum, frame):
+    global STOP
+    STOP = True
+
+def capture(fd, out, chunk):
+    "copy from fd to out until stopped; returns the number of bytes read"
+    total  = 0
+    buffer = []
+    buffered = 0
+    while not STOP:
+        try:
+            data = os.read(fd, chunk)
+        except OSError, err:
+            if err.errno == errno.EINTR:
+                continue
+            raise
+        if not data:
+            break
+        total += len(data)
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= chunk:
+            out.write(''.join(buffer))
+            buffer = []
+            buffered = 0
+    out.write(''.join(buffer))
+    return total
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Capture the LITMUS^RT debug log')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        'source', type=str,
+        help='log device, e.g., /dev/litmus/log')
+    p.add_argument(
+        'output', type=str,
+        help='where to store the log')
+
+    p.add_argument(
+        '-l', '--limit', type=pos_int, dest='limit', default=None,
+        help='keep only about the last LIMIT MiB of the log')
+    p.add_argument(
+        '-z', '--compress', action='store_true', dest='compress', default=False,
+        help='gzip-compress the log')
+    p.add_argument(
+        '--chunk-size', type=pos_int, dest='chunk', default=1024,
+        help='read and write in chunks of this many KiB [default: 1024]')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    for sig in (signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, stop)
+
+    try:
+        fd = os.open(options.source, os.O_RDONLY)
+        if options.limit:
+            out = RingOutput(options.output, options.compress,
+                             options.limit * 1024 * 1024)
+        else:
+            out = Output(options.output, options.compress)
+        # the scripts generated by mkscript.py wait for this
+        print >>sys.stderr, 'logcapture: capturing %s. ' \
+            'Waiting for SIGUSR1...' % options.source
+        total = capture(fd, out, options.chunk * 1024)
+        os.close(fd)
+        out.close()
+    except (IOError, OSError), err:
+        print >>sys.stderr, 'logcapture: %s' % err
+        sys.exit(1)
+
+    print 'logcapture: read %d bytes from %s, kept %d bytes, ' \
+          'dropped %d bytes in %d rotated segments.' % \
+          (total, options.source, total - out.dropped, out.dropped, out.rotated)
+
+if __name__ == '__main__':
+    main()
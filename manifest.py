@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+from __future__ import division
+
+import argparse
+import re
+import sqlite3
+import sys
+
+from os.path import dirname, join, normpath, relpath
+
+from affinity import parse_affinity, mask_weight
+
+# Columns that can be used in --where expressions.
+COLUMNS = [
+    ('name',       'TEXT PRIMARY KEY'),
+    ('file',       'TEXT'),
+    ('apa',        'TEXT'),
+    ('m',          'INTEGER'),
+    ('s',          'INTEGER'),
+    ('n',          'INTEGER'),
+    ('u',          'REAL'),
+    ('seq',        'INTEGER'),
+    ('seed',       'INTEGER'),
+    ('total_util', 'REAL'),
+    ('min_period', 'INTEGER'),
+    ('max_period', 'INTEGER'),
+    ('num_global', 'INTEGER'),
+]
+
+COLUMN_NAMES = [c for (c, _) in COLUMNS]
+
+WHERE_TERM = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*$')
+
+def parse_where(expr):
+    """Translate expressions such as 'm=32,u>0.7' into an SQL condition and
+    its parameters. Terms separated by commas must all hold."""
+    conds  = []
+    values = []
+    for term in expr.split(','):
+        if not term.strip():
+            continue
+        match = WHERE_TERM.match(term)
+        if not match or match.group(1) not in COLUMN_NAMES:
+            raise ValueError('invalid condition: %s' % term)
+        (col, op, val) = match.groups()
+        for conv in (int, float):
+            try:
+                val = conv(val)
+                break
+            except ValueError:
+                pass
+        conds.append('%s %s ?' % (col, op))
+        values.append(val)
+    return (' AND '.join(conds) or '1', values)
+
+def summarize(data, m=None):
+    "achieved utilization, period range, and number of global tasks"
+    tasks = data['tasks']
+    total = sum(t['cost'] / t['period'] for t in tasks)
+    periods = [t['period'] for t in tasks] or [None]
+    num_global = 0
+    if m:
+        for t in tasks:
+            if 'affinity' in t and mask_weight(parse_affinity(t['affinity'])) >= m:
+                num_global += 1
+    return (total, min(periods), max(periods), num_global)
+
+class Manifest(object):
+    """an SQLite index of generated task sets; files are recorded relative
+    to the manifest's directory"""
+
+    def __init__(self, fname, commit_every=100):
+        self.dir = dirname(fname)
+        self.db = sqlite3.connect(fname)
+        self.db.execute('CREATE TABLE IF NOT EXISTS tasksets (%s)' %
+                        ', '.join('%s %s' % c for c in COLUMNS))
+        self.db.commit()
+        self.pending = 0
+        self.commit_every = commit_every
+
+    def names(self):
+        return set(row[0] for row in
+                   self.db.execute('SELECT name FROM tasksets'))
+
+    def exists(self, name):
+        return self.db.execute('SELECT 1 FROM tasksets WHERE name = ?',
+                               (name,)).fetchone() is not None
+
+    def record(self, name, fname, params, data):
+        (total, pmin, pmax, num_global) = summarize(data, params.get('m'))
+        row = dict(params)
+        row.update(name=name, file=relpath(fname, self.dir or '.'),
+                   total_util=total,
+                   min_period=pmin, max_period=pmax, num_global=num_global)
+        self.db.execute('INSERT OR REPLACE INTO tasksets VALUES (%s)' %
+                        ', '.join(['?'] * len(COLUMNS)),
+                        [row.get(c) for c in COLUMN_NAMES])
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.db.commit()
+            self.pending = 0
+
+    def path(self, fname):
+        "the path of a recorded file relative to the working directory"
+        return normpath(join(self.dir, fname))
+
+    def select(self, where='', columns=('file', 'name')):
+        (cond, values) = parse_where(where)
+        return self.db.execute('SELECT %s FROM tasksets WHERE %s ORDER BY name'
+                               % (', '.join(columns), cond), values)
+
+    def statistics(self, where=''):
+        (cond, values) = parse_where(where)
+        return self.db.execute(
+            'SELECT apa, m, s, n, u, COUNT(*), AVG(total_util), '
+            'MIN(min_period), MAX(max_period), AVG(num_global) '
+            'FROM tasksets WHERE %s GROUP BY apa, m, s, n, u '
+            'ORDER BY apa, m, s, n, u' % cond, values)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Query the manifest of generated task sets')
+
+    p.add_argument(
+        'manifest', type=str,
+        help='manifest maintained by mktasks.py --manifest')
+
+    p.add_argument(
+        '--where', type=str, dest='where', default='',
+        help='only consider task sets matching all conditions, '
+             'e.g., m=32,u>0.7 [columns: %s]' % ', '.join(COLUMN_NAMES))
+    p.add_argument(
+        '--stats', action='store_true', dest='want_stats', default=False,
+        help='print statistics per parameter combination '
+             'instead of listing task sets')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    manifest = Manifest(options.manifest)
+    try:
+        if options.want_stats:
+            print 'apa, m, s, n, u, count, avg_total_util, ' \
+                  'min_period, max_period, avg_num_global'
+            for row in manifest.statistics(options.where):
+                print ', '.join(str(x) for x in row)
+        else:
+            for (fname, name) in manifest.select(options.where):
+                fname = manifest.path(fname)
+                if fname.endswith('.json'):
+                    print fname
+                else:
+                    print '%s[%s]' % (fname, name)
+    except ValueError, err:
+        print 'Error: %s' % err
+    finally:
+        manifest.close()
+
+if __name__ == '__main__':
+    main()
@@ -5,16 +5,30 @@ from __future__ import division
 import argparse
 import sys
 
-from os.path import basename, exists, dirname
+from os.path import basename, exists, dirname, relpath
 from os import chmod, makedirs
 
 import random
 import sys
 import stat
 import json
+import hashlib
+
+from collections import OrderedDict
+from pipes import quote
+from string import Formatter
+from multiprocessing import Pool
 
 from config import *
 from templates import *
+from affinity import get_affinity, mask_to_cpus, format_ranges
+from columnar import ColumnarReader, index_name
+from archive import iter_archive, is_archive
+from manifest import Manifest
+from topology import load_topology
+from interference import load_profile, background_plan
+from estimate import estimate, overflow_risks, summary
+from shard import plan, shard_name, format_time
 
 def us2ms(x):
     return x / 1000
@@ -22,153 +36,273 @@ def us2ms(x):
 def core(n):
     return '${CORE[%d]}' % n
 
-def get_affinity(tsk_json):
-    if 'affinity' in tsk_json:
-        return tsk_json['affinity']
-    elif 'partition' in tsk_json:
-        return [tsk_json['partition']]
-    elif 'core' in tsk_json:
-        return [tsk_json['core']]
-    else:
-        # no affinity given -> default to core zero
-        return [0]
+def script_rng(name):
+    """a random number generator seeded by the task set's name, so that
+    the generated script does not depend on the order of processing"""
+    return random.Random(int(hashlib.md5(name).hexdigest()[:8], 16))
+
+def compile_template(template, constants):
+    """split a template into (literal, field, format_spec) fragments plus a
+    trailing literal, folding in the fields whose values are given"""
+    fragments = []
+    literal = ''
+    for (text, field, spec, _) in Formatter().parse(template):
+        literal += text
+        if field is None:
+            continue
+        if field in constants:
+            literal += format(constants[field], spec)
+        else:
+            fragments.append((literal, field, spec))
+            literal = ''
+    return (fragments, literal)
+
+def render_template(compiled, values, out):
+    (fragments, tail) = compiled
+    for (literal, field, spec) in fragments:
+        out.append(literal)
+        out.append(format(values[field], spec))
+    out.append(tail)
+
+class LaunchPlan(object):
+    """How to launch tasks under one scheduler with one set of options: which
+    per-task fields apply, and the launch templates with all fields that are
+    the same for every task already filled in."""
+
+    def __init__(self, scheduler, scale, duration, want_nanosleep,
+                 batch_launch):
+        self.batch       = batch_launch
+        self.apa         = scheduler in APA_SCHEDULERS
+        self.fp          = scheduler in FIXED_PRIORITY_SCHEDULERS
+        self.partitioned = scheduler in PARTITIONED_SCHEDULERS
+
+        constants = {
+            'scale'       : scale,
+            'duration'    : duration,
+            'reservation' : '-R' if scheduler in RESERVATION_SCHEDULERS else '',
+            'timer'       : '-T' if want_nanosleep else '',
+        }
+        if not self.apa:
+            constants['taskset'] = ''
+        if not self.fp:
+            constants['prio'] = ''
+        if not self.partitioned:
+            constants['partition'] = ''
+
+        if batch_launch:
+            self.rtspin    = compile_template(RTSPIN_ENTRY, constants)
+            self.rt_launch = compile_template(RT_LAUNCH_ENTRY, constants)
+        else:
+            self.rtspin    = compile_template(RTSPIN, constants)
+            self.rt_launch = compile_template(RT_LAUNCH, constants)
+
+LAUNCH_PLANS = {}
+
+def launch_plan(scheduler, scale, duration, want_nanosleep, batch_launch):
+    key = (scheduler, scale, duration, want_nanosleep, batch_launch)
+    if key not in LAUNCH_PLANS:
+        LAUNCH_PLANS[key] = LaunchPlan(*key)
+    return LAUNCH_PLANS[key]
+
+def topology_setup(topology=None):
+    "embed the given topology, or discover it when the script runs"
+    if topology is None:
+        return DISCOVER_TOPOLOGY.format()
+    return EMBEDDED_TOPOLOGY.format(
+        cores     = ' '.join(str(c) for c in topology.cores),
+        sockets   = ' '.join(str(s) for s in topology.sockets),
+        signature = topology.signature(),
+        discover  = DISCOVER_TOPOLOGY.format(),
+    )
 
 def generate_sh(name, data,
                 duration=30,
                 scale=0.95,
                 scheduler='P-FP',
                 want_debug=False,
+                debug_log_limit=None,
+                compress_debug_log=False,
                 want_overheads=False,
                 process_overheads=False,
                 want_cleanup=False,
                 want_schedule=False,
                 default_wss=0,
                 background_wss=0,
+                interference=None,
+                interference_name='',
                 service_core=None,
                 want_nanosleep=False,
                 binaries=None,
-                prefix=''):
-    fname = prefix + name + '.sh'
-    f = open(fname, 'w')
-    f.write(PREAMBLE.format(
+                batch_launch=False,
+                topology=None,
+                tracer_timeout=30,
+                prefix='',
+                rng=None):
+    if rng is None:
+        rng = script_rng(name)
+    launch = launch_plan(scheduler, scale, duration, want_nanosleep,
+                         batch_launch)
+
+    # The script is assembled in memory and written at once.
+    out = []
+    out.append(PREAMBLE.format(
         sched = scheduler,
         name = name,
-        duration = duration
+        duration = duration,
+        tracer_timeout = tracer_timeout,
+    ))
+    out.append(STANDALONE_SETUP.format(setup =
+        CHECK_ENVIRONMENT.format(sched = scheduler) +
+        topology_setup(topology) +
+        SET_SCHEDULER.format(scheduler = 'Linux')
     ))
-    f.write(SET_SCHEDULER.format(scheduler = 'Linux'))
 
     if scheduler in MP_SCHEDULERS:
         if service_core is None:
             max_cpu = 0
-            for t in data['tasks'].itervalues():
-                max_cpu = max(max_cpu, max(get_affinity(t)))
+            for t in data['tasks']:
+                max_cpu = max(max_cpu, get_affinity(t).bit_length() - 1)
             max_cpu += 1
             service_core = max_cpu
 
         trace_affinity = SET_AFFINITY.format(core_list = core(service_core))
-        f.write(SET_DSP.format(scheduling_core = core(service_core)))
+        out.append(SET_DSP.format(scheduling_core = core(service_core)))
     else:
         trace_affinity = ''
 
-    f.write(SET_SCHEDULER.format(scheduler = scheduler))
+    out.append(SET_SCHEDULER.format(scheduler = scheduler))
 
-    if background_wss > 0:
-        f.write(BACKGROUND_WORKLOAD.format(wss_in_pages = background_wss))
+    if interference is not None:
+        rt_cores = 0
+        for t in data['tasks']:
+            rt_cores |= get_affinity(t)
+        out.append(INTERFERENCE_WORKLOAD.format(
+            profile = interference_name,
+            **background_plan(interference, mask_to_cpus(rt_cores),
+                              background_wss)
+        ))
+    elif background_wss > 0:
+        out.append(BACKGROUND_WORKLOAD.format(wss_in_pages = background_wss))
+
+    if want_debug or want_schedule or want_overheads:
+        out.append(TRACER_READY_SETUP)
+
+    # The debug and schedule tracers start together, before the tasks are
+    # launched, and are waited for at once.
+    num_tracers = 0
 
     if want_debug:
-        f.write(DEBUG_TRACE.format(
+        if debug_log_limit or compress_debug_log:
+            options = []
+            if debug_log_limit:
+                options.append('-l %d' % debug_log_limit)
+            if compress_debug_log:
+                options.append('-z')
+            check   = LOGCAPTURE_CHECK
+            capture = DEBUG_LOG_CAPTURE.format(options = ' '.join(options))
+        else:
+            check   = ''
+            capture = DEBUG_LOG_CAT
+        out.append(DEBUG_TRACE.format(
             name = name,
-            taskset = trace_affinity
+            taskset = trace_affinity,
+            check = check,
+            capture = capture,
+            tracer = 'logcapture.py' if check else 'cat',
+            suffix = '.gz' if compress_debug_log else '',
         ))
+        num_tracers += 1
     if want_schedule:
-        f.write(SCHEDULE_TRACE.format(
+        out.append(SCHEDULE_TRACE.format(
             name = name,
             taskset = trace_affinity
         ))
+        num_tracers += 1
+    if num_tracers:
+        out.append(WAIT_FOR_TRACERS.format(num_tracers = num_tracers))
 
     num_tasks = len(data['tasks'])
 
-    f.write(TASK_LAUNCH_PREFIX.format(
+    if launch.apa or launch.partitioned:
+        masks = [get_affinity(t) for t in data['tasks']]
+
+    if launch.apa:
+        # Resolve each distinct affinity to a list of CPUs only once.
+        affinity_prefix = {}
+        for mask in masks:
+            if mask not in affinity_prefix:
+                var = 'AFFINITY_%d' % len(affinity_prefix)
+                affinity_prefix[mask] = SET_AFFINITY.format(core_list = '$' + var)
+                out.append(DEFINE_AFFINITY.format(
+                    var    = var,
+                    ranges = format_ranges(mask),
+                ))
+
+    out.append(TASK_LAUNCH_PREFIX.format(
         num_tasks = num_tasks
     ))
-
-    for t in data['tasks']:
-        if scheduler in APA_SCHEDULERS:
-            core_list = ",".join([core(x) for x in get_affinity(t)])
-            affinity = SET_AFFINITY.format(core_list = core_list)
-        else:
-            affinity = ''
-        if scheduler in FIXED_PRIORITY_SCHEDULERS:
-            prio = '-q %s' % t['priority']
-        else:
-            prio =''
-        if scheduler in RESERVATION_SCHEDULERS:
-            reservation = '-R'
-        else:
-            reservation = ''
-        if scheduler in PARTITIONED_SCHEDULERS:
-            partition = '-p %s' % core(random.choice(get_affinity(t)))
-        else:
-            partition = ''
-
-        wss = default_wss
-        if 'wss' in t:
-            wss = t['wss']
-        if wss:
-            wss = '-m %s' % wss
-        else:
-            wss = ''
-
-        timer_opt = ''
-        if want_nanosleep:
-            timer_opt = '-T'
-
-        binary = None
-        if 'cmd' in t:
-            binary = t['cmd']
+    if launch.batch:
+        out.append(BATCH_LAUNCH_PREFIX)
+
+    values = {}
+    cpu_lists = {}
+    for (i, t) in enumerate(data['tasks']):
+        if launch.apa:
+            values['taskset'] = affinity_prefix[masks[i]]
+        if launch.fp:
+            values['prio'] = '-q %s' % t['priority']
+        if launch.partitioned:
+            if masks[i] not in cpu_lists:
+                cpu_lists[masks[i]] = mask_to_cpus(masks[i])
+            values['partition'] = '-p %s' % core(rng.choice(cpu_lists[masks[i]]))
+
+        wss = t.get('wss', default_wss)
+        values['wss'] = '-m %s' % wss if wss else ''
+
+        binary = t.get('cmd')
         if not binary and binaries:
-            binary = random.choice(binaries)
+            binary = rng.choice(binaries)
         if not binary or binary == 'rtspin':
-            tmpl = RTSPIN
+            compiled = launch.rtspin
         else:
-            tmpl = RT_LAUNCH
-        f.write(tmpl.format(
-            taskset       = affinity,
-            prio          = prio,
-            cost          = us2ms(t['cost']),
-            period        = us2ms(t['period']),
-            duration      = duration,
-            scale         = scale,
-            reservation   = reservation,
-            partition     = partition,
-            wss           = wss,
-            timer         = timer_opt,
-            tid           = t['id'],
-            cmd           = binary,
-        ))
+            compiled = launch.rt_launch
+
+        values['cost']   = us2ms(t['cost'])
+        values['period'] = us2ms(t['period'])
+        values['tid']    = t['id']
+        values['cmd']    = binary
+        render_template(compiled, values, out)
 
-    f.write(TASK_LAUNCH_SUFFIX.format(
+    if launch.batch:
+        out.append(BATCH_LAUNCH_SUFFIX)
+    out.append(TASK_LAUNCH_SUFFIX.format(
         num_tasks = num_tasks
     ))
 
+    # The overhead tracer starts only after the tasks have been launched,
+    # so that it does not record the launch.
     if want_overheads:
-        f.write(OVERHEAD_TRACE.format(
+        out.append(OVERHEAD_TRACE.format(
             num_tasks = num_tasks,
             name = name,
             taskset = trace_affinity
         ))
+        out.append(WAIT_FOR_TRACERS.format(num_tracers = 1))
 
-    f.write(MAIN_EXP.format(
+    out.append(MAIN_EXP.format(
         num_tasks = len(data['tasks']),
         duration  = duration,
     ))
-    f.write(SET_SCHEDULER.format(scheduler = 'Linux'))
+    out.append(SET_SCHEDULER.format(scheduler = 'Linux'))
 
     if want_overheads and process_overheads:
-        f.write(PROCESS_OVERHEAD_TRACE.format(name = name))
+        out.append(PROCESS_OVERHEAD_TRACE.format(name = name))
         if want_cleanup:
-            f.write(CLEAN_UP_RAW_FILES.format(name = name))
+            out.append(CLEAN_UP_RAW_FILES.format(name = name))
 
+    fname = prefix + name + '.sh'
+    f = open(fname, 'w')
+    f.write(''.join(out))
     f.close()
     chmod(fname, stat.S_IRGRP | stat.S_IROTH | stat.S_IRWXU)
 
@@ -177,6 +311,24 @@ def load_ts_from_json(fname):
     data = json.load(open(fname, 'r'))
     return data
 
+def load_tasksets(fname, names=None):
+    """yield (source, name, data) for each task set in a file or an archive,
+    optionally restricted to the given names"""
+    if exists(index_name(fname)):
+        reader = ColumnarReader(fname)
+        for (i, (name, _)) in enumerate(reader.iter_raw()):
+            if names is None or name in names:
+                (name, data) = reader[i]
+                yield ('%s[%s]' % (fname, name), name, data)
+        reader.close()
+    elif is_archive(fname):
+        for (name, data) in iter_archive(fname):
+            if names is None or name in names:
+                yield ('%s[%s]' % (fname, name), name, data)
+    else:
+        yield (fname, basename(fname).replace('.json', ''),
+               load_ts_from_json(fname))
+
 def parse_args():
     p = argparse.ArgumentParser(
         description='LITMUS^RT setup script generator')
@@ -189,7 +341,8 @@ def parse_args():
 
     p.add_argument(
         'files', nargs='*', type=str, metavar='input-files',
-        help='task set descriptions in JSON format')
+        help='task set descriptions in JSON format, columnar containers, '
+             'or JSONL archives')
 
     p.add_argument(
         '-S', '--trace-schedule', action='store_true', dest='want_sched_trace',
@@ -212,6 +365,16 @@ def parse_args():
         '-D', '--trace-debug-log', action='store_true', dest='want_debug_trace',
         default=False,
         help='Record TRACE() messages [debug feature]')
+    p.add_argument(
+        '--debug-log-limit', type=pos_int, dest='debug_log_limit',
+        default=None,
+        help='keep only about the last N MiB of TRACE() messages '
+             '(requires logcapture.py)')
+    p.add_argument(
+        '--compress-debug-log', action='store_true', dest='compress_debug_log',
+        default=False,
+        help='gzip-compress TRACE() messages while recording them '
+             '(requires logcapture.py)')
 
 
     p.add_argument(
@@ -227,6 +390,10 @@ def parse_args():
     p.add_argument(
         '-b', '--bg-memory', type=pos_int, dest='bg_wss', default=1024,
         help='working set size of background cache-thrashing tasks [in 4K pages]')
+    p.add_argument(
+        '--interference', type=str, dest='interference', default=None,
+        help='start background tasks according to this interference '
+             'profile (see interference.py) instead of one per core')
     p.add_argument(
         '-p', '--scheduler', type=str, dest='plugin', default='P-FP',
         help='Which scheduler plugin to use?')
@@ -235,16 +402,178 @@ def parse_args():
         help='Which core is the dedicated service processor? ' +
             'Relevant only for message-passing plugins.')
 
+    p.add_argument(
+        '--tracer-timeout', type=pos_int, dest='tracer_timeout', default=30,
+        help='how many seconds to wait for tracers to become ready '
+             '[default: 30]')
+
     p.add_argument(
         '--binaries', type=str, nargs='*', dest='binaries', default=None,
         help='Which programs to launch as real-time tasks? [default: rtspin]')
+    p.add_argument(
+        '--batch-launch', action='store_true', dest='batch_launch',
+        default=False,
+        help='launch all tasks from a single launcher.py process '
+             'instead of one background job per task')
 
     p.add_argument(
         '--prefix', type=str, dest='prefix', default='./',
         help='Where to store the generated script[s]?')
 
+    p.add_argument(
+        '--topology', type=str, dest='topology', default=None,
+        help='embed the CPU topology read from this sysfs-like directory '
+             'or saved topology file (see topology.py) instead of '
+             'discovering it when the script runs')
+
+    p.add_argument(
+        '--campaign', type=str, dest='campaign', default=None,
+        help='also generate a driver script that runs all generated '
+             'experiments back-to-back')
+
+    p.add_argument(
+        '--shards', type=pos_int, dest='shards', default=None,
+        help='also split the experiments into this many shards of about '
+             'equal run time, each with its own driver named after '
+             '--campaign (default: shard-1.sh, ...; see shard.py)')
+
+    p.add_argument(
+        '--manifest', type=str, dest='manifest', default=None,
+        help='also process the task sets recorded in this manifest '
+             '(see mktasks.py --manifest)')
+    p.add_argument(
+        '--where', type=str, dest='where', default='',
+        help='only process manifest entries matching all conditions, '
+             'e.g., m=32,u>0.7')
+
+    p.add_argument(
+        '-j', '--jobs', type=pos_int, dest='jobs', default=1,
+        help='how many input files to process in parallel [default: 1]')
+    p.add_argument(
+        '--estimate', action='store_true', dest='estimate', default=False,
+        help='print the expected number of jobs and size of the traces '
+             'of each experiment (see estimate.py)')
+
+    options = p.parse_args()
+    if options.where and not options.manifest:
+        p.error('--where requires --manifest')
+    return options
+
+def script_options(options):
+    "map command-line options to keyword arguments of generate_sh()"
+    return dict(
+        scheduler=options.plugin,
+        duration=options.duration,
+        want_debug=options.want_debug_trace,
+        debug_log_limit=options.debug_log_limit,
+        compress_debug_log=options.compress_debug_log,
+        want_overheads=options.want_overheads,
+        process_overheads=options.process_overheads,
+        want_cleanup=options.want_cleanup,
+        want_schedule=options.want_sched_trace,
+        background_wss=options.bg_wss,
+        interference=options.interference_profile,
+        interference_name=options.interference,
+        default_wss=options.wss,
+        service_core=options.service_core,
+        want_nanosleep=options.use_nanosleep,
+        binaries=options.binaries,
+        batch_launch=options.batch_launch,
+        topology=options.topology,
+        tracer_timeout=options.tracer_timeout,
+        prefix=options.prefix,
+    )
+
+def select_inputs(options):
+    "(file, names) pairs to process; names is None for all task sets"
+    inputs = [(fname, None) for fname in options.files]
+    if options.manifest:
+        manifest = Manifest(options.manifest)
+        selected = OrderedDict()
+        for (fname, name) in manifest.select(options.where):
+            selected.setdefault(manifest.path(fname), set()).add(name)
+        manifest.close()
+        for fname in selected:
+            if not exists(fname):
+                print '%s: %s (%d task sets) is missing' % \
+                    (options.manifest, fname, len(selected[fname]))
+        inputs += [(fname, names) for (fname, names) in selected.items()
+                   if exists(fname)]
+    return inputs
+
+def generate_campaign(fname, scripts, scheduler='P-FP', topology=None):
+    """generate a driver that runs the given experiment scripts one after
+    the other, performing checks and topology discovery only once"""
+    name = basename(fname)
+    if name.endswith('.sh'):
+        name = name[:-len('.sh')]
+    campaign_dir = dirname(fname) or '.'
+    out = []
+    out.append(CAMPAIGN_PREAMBLE.format(
+        name = name,
+        sched = scheduler,
+        num_experiments = len(scripts),
+    ))
+    out.append(CHECK_ENVIRONMENT.format(sched = scheduler))
+    out.append(topology_setup(topology))
+    out.append(SET_SCHEDULER.format(scheduler = 'Linux'))
+    out.append(CAMPAIGN_MAIN.format(
+        experiments = '\n'.join('    ' + quote(relpath(s, campaign_dir))
+                                for s in scripts),
+    ))
+
+    f = open(fname, 'w')
+    f.write(''.join(out))
+    f.close()
+    chmod(fname, stat.S_IRGRP | stat.S_IROTH | stat.S_IRWXU)
 
-    return p.parse_args()
+def generate_shards(prefix, scripts, n, topology=None, history=None):
+    """split the scripts into n shards of about equal run time and generate
+    a campaign driver for each"""
+    (shards, scheduler) = plan(scripts, n, history)
+    for (i, (shard, total)) in enumerate(shards):
+        if not shard:
+            continue
+        fname = shard_name(prefix, i, n)
+        print '%s: %d experiments, about %s' % \
+            (fname, len(shard), format_time(total))
+        generate_campaign(fname, shard, scheduler, topology)
+
+def estimate_messages(ts, kargs, show_estimate=False):
+    "the estimated trace volume and warnings about likely buffer overflows"
+    tracers = []
+    if kargs['want_overheads']:
+        tracers.append('ft_trace')
+    if kargs['want_schedule']:
+        tracers.append('sched_trace')
+    if not (tracers or show_estimate):
+        return
+    est = estimate(ts, kargs['duration'])
+    if show_estimate:
+        yield '    Estimate: %s' % summary(est, tracers)
+    for tracer in overflow_risks(est):
+        if tracer in tracers:
+            yield '    Warning: %s buffers are likely to overflow ' \
+                  '(see estimate.py).' % tracer
+
+def process_input(fname, names, kargs, show_estimate=False):
+    """generate the scripts for one input file, yielding pairs of a
+    progress or error message and the name of a generated script"""
+    try:
+        for (source, name, ts) in load_tasksets(fname, names):
+            script = kargs['prefix'] + name + '.sh'
+            yield ('Processing %s -> %s' % (source, script), None)
+            generate_sh(name, ts, **kargs)
+            for msg in estimate_messages(ts, kargs, show_estimate):
+                yield (msg, None)
+            yield (None, script)
+    except IOError, err:
+        yield ('%s: %s' % (fname, err), None)
+    except ValueError, err:
+        yield ('%s: %s' % (fname, err), None)
+
+def process_input_job(args):
+    return list(process_input(*args))
 
 def main(args=sys.argv[1:]):
     options = parse_args()
@@ -253,29 +582,67 @@ def main(args=sys.argv[1:]):
     if prefix_dir and not exists(prefix_dir):
         makedirs(prefix_dir)
 
-    for fname in options.files:
-        name = basename(fname).replace('.json', '')
-        print 'Processing %s -> %s' % (fname, options.prefix + name + '.sh')
+    try:
+        inputs = select_inputs(options)
+    except ValueError, err:
+        print '%s: %s' % (options.manifest, err)
+        return
+
+    if options.topology:
+        try:
+            options.topology = load_topology(options.topology)
+        except (IOError, ValueError), err:
+            print '%s: %s' % (options.topology, err)
+            return
+
+    options.interference_profile = None
+    if options.interference:
+        try:
+            options.interference_profile = load_profile(options.interference)
+        except (IOError, ValueError), err:
+            print '%s: %s' % (options.interference, err)
+            return
+
+    kargs = script_options(options)
+    if options.jobs > 1:
+        pool = Pool(options.jobs)
+        # ordered, so that messages appear as in a serial run
+        results = pool.imap(process_input_job,
+                            [(fname, names, kargs, options.estimate)
+                             for (fname, names) in inputs])
+    else:
+        results = (process_input(fname, names, kargs, options.estimate)
+                   for (fname, names) in inputs)
+
+    scripts = []
+    for msgs in results:
+        for (msg, script) in msgs:
+            if msg:
+                print msg
+            if script:
+                scripts.append(script)
+
+    if options.jobs > 1:
+        pool.close()
+        pool.join()
+
+    if options.campaign:
+        print 'Campaign of %d experiments -> %s' % \
+            (len(scripts), options.campaign)
+        generate_campaign(options.campaign, scripts, options.plugin,
+                          kargs['topology'])
+
+    if options.shards:
+        if options.campaign:
+            prefix = options.campaign[:-len('.sh')] \
+                     if options.campaign.endswith('.sh') else options.campaign
+        else:
+            prefix = options.prefix + 'shard'
         try:
-            ts = load_ts_from_json(fname)
-            generate_sh(name, ts,
-                        scheduler=options.plugin,
-                        duration=options.duration,
-                        want_debug=options.want_debug_trace,
-                        want_overheads=options.want_overheads,
-                        process_overheads=options.process_overheads,
-                        want_cleanup=options.want_cleanup,
-                        want_schedule=options.want_sched_trace,
-                        background_wss=options.bg_wss,
-                        default_wss=options.wss,
-                        service_core=options.service_core,
-                        want_nanosleep=options.use_nanosleep,
-                        binaries=options.binaries,
-                        prefix=options.prefix)
-        except IOError, err:
-            print '%s: %s' % (fname, err)
-        except ValueError, err:
-            print '%s: %s' % (fname, err)
+            generate_shards(prefix, scripts, options.shards,
+                            kargs['topology'])
+        except (IOError, ValueError), err:
+            print err
 
 if __name__ == '__main__':
     main()
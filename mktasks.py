@@ -7,110 +7,242 @@ import sys
 
 from math import ceil
 
-from os.path import exists, dirname
+from os.path import exists, dirname, basename
 from os import makedirs
 
 import random
 import json
+import hashlib
+
+from copy import copy
+
+from multiprocessing import Pool
+
+import numpy
 
 from schedcat.model.tasks import TaskSystem, SporadicTask
 from schedcat.util.time import ms2us
-from schedcat.sched import get_native_affinities, get_native_taskset
-from schedcat.sched.native import apa_implicit_deadline_feasible
 import schedcat.generator.generator_emstada as emstada
 
+from affinity import cpus_to_mask, mask_to_cpus, mask_weight, format_ranges
+from feasibility import APAFeasibility, laminar_feasible
+from columnar import ColumnarWriter
+from archive import ArchiveWriter
+from manifest import Manifest
+from topology import load_topology
+from rta import uniprocessor_schedulable
+from partition import partition, HEURISTICS
+
 def is_feasible(taskset):
+    ok = laminar_feasible([t.utilization() for t in taskset],
+                          [t.affinity for t in taskset])
+    if ok is not None:
+        return ok
+
+    # Not laminar; fall back to the general solver, which expects the
+    # affinities as sets of cores.
+    from schedcat.sched import get_native_affinities, get_native_taskset
+    from schedcat.sched.native import apa_implicit_deadline_feasible
+    taskset = TaskSystem(copy(t) for t in taskset)
+    for t in taskset:
+        t.affinity = set(mask_to_cpus(t.affinity))
     aff = get_native_affinities(taskset)
     ts  = get_native_taskset(taskset)
     sol = apa_implicit_deadline_feasible(ts, aff)
     return True if sol else False
 
-def make_taskset(n, u, min_wcet=200, max_period=ms2us(5000)):
-    ts = emstada.gen_taskset('uni-broad', 'logunif', n, u,
-            period_granularity=1, want_integral=True, scale=ms2us)
+def feasibility_oracle(ts, m, candidates=()):
+    return APAFeasibility([t.utilization() for t in ts],
+                          [t.affinity for t in ts], m, candidates)
+
+def uunifast_discard(k, n, u, max_rounds=100):
+    "k vectors of n utilizations, each summing to u with no entry above one"
+    utils = numpy.empty((k, n))
+    have = 0
+    for _ in xrange(max_rounds):
+        want = k - have
+        if not want:
+            break
+        r = numpy.random.random((want, n - 1)) ** (1 / numpy.arange(n - 1, 0, -1))
+        sums = u * numpy.cumprod(r, axis=1)
+        x = -numpy.diff(numpy.c_[numpy.full(want, u), sums, numpy.zeros(want)])
+        ok = x[(x <= 1).all(axis=1)]
+        utils[have:have + len(ok)] = ok
+        have += len(ok)
+    if have < k:
+        # UUniFast-discard rejects almost all samples if u is close to n;
+        # fall back to Stafford's RandFixedSum algorithm for the remainder.
+        utils[have:] = emstada.StaffordRandFixedSum(n, u, k - have)
+    return utils
+
+def min_wcet_exponents(cost, period, min_wcet, max_period):
+    "how often to double each task's parameters to reach min_wcet"
+    need = numpy.ceil(numpy.log2(min_wcet / cost)).astype(numpy.int64)
+    need = numpy.maximum(need, 0)
+    # correct floating-point rounding in either direction
+    need[(cost << need) < min_wcet] += 1
+    need[(need > 0) & ((cost << numpy.maximum(need - 1, 0)) >= min_wcet)] -= 1
+
+    room = numpy.floor(numpy.log2(max_period / period)).astype(numpy.int64)
+    room = numpy.maximum(room, 0)
+    room[(period << room) > max_period] -= 1
+    room[(period << (room + 1)) <= max_period] += 1
+    room = numpy.maximum(room, 0)
+
+    return numpy.minimum(need, room)
+
+def make_tasksets(k, n, u, min_wcet=200, max_period=ms2us(5000),
+                  period_range=(1, 1000)):
+    """Generate k task sets of n tasks each with total utilization u.
+
+    Utilizations are drawn with UUniFast-discard, periods log-uniformly
+    from period_range (in integral milliseconds).
+    """
+    if n == 0:
+        return [TaskSystem() for _ in xrange(k)]
+
+    utils = uunifast_discard(k, n, u)
+
+    (pmin, pmax) = period_range
+    periods = numpy.floor(numpy.exp(numpy.random.uniform(
+        numpy.log(pmin), numpy.log(pmax + 1), size=(k, n))))
+    periods = ms2us(numpy.maximum(periods, pmin)).astype(numpy.int64)
+    costs = numpy.maximum(numpy.ceil(utils * periods), 1).astype(numpy.int64)
+
+    # Try to reach minimum cost by scaling up the period,
+    # but without generating extremely large periods.
+    exp = min_wcet_exponents(costs, periods, min_wcet, max_period)
+    costs <<= exp
+    periods <<= exp
+
+    return [TaskSystem([SporadicTask(int(c), int(p))
+                        for (c, p) in zip(costs[i], periods[i])])
+            for i in xrange(k)]
 
-    for t in ts:
-        # Try to reach minimum cost by scaling up the period,
-        # but without generating extremely large periods.
-        while t.cost < min_wcet and t.period * 2 <= max_period:
-            t.cost *= 2
-            t.period *= 2
-            t.deadline *= 2
-
-    return ts
-
-def three_level_affinities(m, num_sockets):
+def make_taskset(n, u, min_wcet=200, max_period=ms2us(5000)):
+    return make_tasksets(1, n, u, min_wcet, max_period)[0]
+
+def make_rm_schedulable_tasksets(k, n, u, max_rounds=100):
+    """Generate k task sets like make_tasksets() that are schedulable on a
+    uniprocessor with rate-monotonic priorities.
+
+    Task sets that fail the response-time analysis are replaced by new ones,
+    for at most max_rounds rounds. Returns the task sets (None for those
+    that could not be replaced) and the number of rejected task sets.
+    """
+    sets = make_tasksets(k, n, u)
+    ok = uniprocessor_schedulable(sets)
+    rejected = 0
+    for _ in xrange(max_rounds):
+        redo = numpy.flatnonzero(~ok)
+        if not len(redo):
+            break
+        rejected += len(redo)
+        fresh = make_tasksets(len(redo), n, u)
+        for (i, ts) in zip(redo, fresh):
+            sets[i] = ts
+        ok[redo] = uniprocessor_schedulable(fresh)
+    for i in numpy.flatnonzero(~ok):
+        sets[i] = None
+    return (sets, rejected)
+
+def three_level_affinities(m, num_sockets, socket_sizes=None):
     per_socket = int(ceil(m / num_sockets))
-    all_cores = frozenset(range(0, m))
+    all_cores = (1 << m) - 1
 
     sockets = []
-    for i in range(0, num_sockets):
-        s = range(i * per_socket, (i + 1) * per_socket)
-        # check for last incomplete socket
-        while s[-1] >= m:
-            del s[-1]
-        sockets.append(frozenset(s))
-    parts = [frozenset([x]) for x in all_cores]
+    if socket_sizes:
+        # actual socket layout, e.g., from topology.py
+        first = 0
+        for size in socket_sizes:
+            sockets.append(cpus_to_mask(range(first, first + size)))
+            first += size
+    else:
+        for i in range(0, num_sockets):
+            s = range(i * per_socket, (i + 1) * per_socket)
+            # check for last incomplete socket
+            while s[-1] >= m:
+                del s[-1]
+            sockets.append(cpus_to_mask(s))
+    parts = [1 << x for x in range(0, m)]
     return ([all_cores], sockets, parts)
 
 
-def assign_three_level_affinities(ts, m, sockets, max_tries=10):
-    affinities = three_level_affinities(m, sockets)
+def assign_three_level_affinities(ts, m, sockets, max_tries=10, guided=False,
+                                  socket_sizes=None):
+    affinities = three_level_affinities(m, sockets, socket_sizes)
 
     # initially global
     for t in ts:
         t.affinity = affinities[0][0]
 
-    assert is_feasible(ts)
+    oracle = feasibility_oracle(ts, m, [a for g in affinities for a in g])
+    assert oracle.feasible
 
-    for t in ts:
+    for i, t in enumerate(ts):
+        if guided:
+            # pick only among affinities that pass the prefilter
+            groups = [g for g in [oracle.choices(i, g) for g in affinities] if g]
+        else:
+            groups = affinities
         attempts = 1
         while True:
             attempts += 1
-            group = random.choice(affinities)
-            t.affinity = random.choice(group)
-            if is_feasible(ts):
+            group = random.choice(groups)
+            aff = random.choice(group)
+            if oracle.try_affinity(i, aff):
+                t.affinity = aff
                 break
             if attempts >= max_tries:
-                # restore global
-                t.affinity = affinities[0][0]
+                # remains global
                 break
 
+    assert is_feasible(ts)
+
 def all_possible_affinities(m):
-    all_cores = frozenset(range(0, m))
+    all_cores = (1 << m) - 1
     to_look_at = [all_cores]
     while to_look_at:
         aff = to_look_at.pop()
         yield aff
-        if len(aff) > 1:
+        cpus = mask_to_cpus(aff)
+        if len(cpus) > 1:
             # can be subdivided
-            mid = sorted(aff)[len(aff) // 2]
-            left  = frozenset([x for x in aff if x < mid])
-            right = frozenset([x for x in aff if x >= mid])
+            mid = len(cpus) // 2
+            left  = cpus_to_mask(cpus[:mid])
+            right = cpus_to_mask(cpus[mid:])
             to_look_at.append(left)
             to_look_at.append(right)
 
-def assign_random_laminar_affinities(ts, m, max_tries=10):
+def assign_random_laminar_affinities(ts, m, max_tries=10, guided=False):
     all_picks = list(all_possible_affinities(m))
 
     # initially global
     for t in ts:
         t.affinity = all_picks[0]
 
-    assert is_feasible(ts)
+    oracle = feasibility_oracle(ts, m, all_picks)
+    assert oracle.feasible
 
-    for t in ts:
+    for i, t in enumerate(ts):
+        if guided:
+            # pick only among affinities that pass the prefilter
+            picks = oracle.choices(i, all_picks)
+        else:
+            picks = all_picks
         attempts = 1
         while True:
             attempts += 1
-            t.affinity = random.choice(all_picks)
-            if is_feasible(ts):
+            aff = random.choice(picks)
+            if oracle.try_affinity(i, aff):
+                t.affinity = aff
                 break
             if attempts >= max_tries:
-                # restore global
-                t.affinity = all_picks[0]
+                # remains global
                 break
 
+    assert is_feasible(ts)
+
 def assign_random_priorities(ts):
     "assign random priorities"
     prios = range(1, len(ts) + 1)
@@ -127,30 +259,36 @@ def assign_rm_priorities(ts):
 
 def assign_arm_priorities(ts):
     "assign affinity- and rate-monotonic priorities"
-    for (t, i) in zip(sorted(ts, key=lambda t: (1/len(t.affinity), t.period)), range(1, len(ts) + 1)):
+    for (t, i) in zip(sorted(ts, key=lambda t: (1/mask_weight(t.affinity), t.period)), range(1, len(ts) + 1)):
         t.priority = i
     ts.assign_ids()
 
-def to_hex(affinity):
-    hex = 0
-    for cpu in affinity:
-        hex |= (1 << cpu)
-    return hex
+def seed_rng(apa_type, m, n, u, seq, sockets=0, base=0):
+    "derive the RNG state for one task set from its generation parameters"
+    key = '%s m=%d s=%d n=%d u=%d seq=%d base=%d' % \
+        (apa_type, m, sockets, n, int(round(10000 * u)), seq, base)
+    seed = int(hashlib.md5(key).hexdigest()[:8], 16)
+    random.seed(seed)
+    numpy.random.seed(seed)
+    return seed
 
-def to_json(ts):
+def to_data(ts):
     tsks = []
     for i, t in enumerate(ts):
         tsks.append({
             'id'       : i + 1,
             'cost'     : t.cost,
             'period'   : t.period,
-            'affinity' : list(t.affinity),
+            'affinity' : format_ranges(t.affinity),
             'priority' : t.priority,
         })
     data = {
         'tasks' : tsks,
     }
-    return json.dumps(data, sort_keys=True, indent=4, separators=(',', ': '))
+    return data
+
+def to_json(ts):
+    return json.dumps(to_data(ts), sort_keys=True, indent=4, separators=(',', ': '))
 
 def store(ts, fname):
     print '=>', fname
@@ -158,57 +296,202 @@ def store(ts, fname):
     f.write(to_json(ts))
     f.close()
 
-def store_random_taskset(m, n, u, seq, prefix=''):
+def taskset_name(fname):
+    return basename(fname).replace('.json', '')
+
+# Where to put generated task sets. A sink decides whether a task set
+# exists already and stores new ones, returning the file that holds them.
+
+class JSONFiles(object):
+    "store each task set in its own JSON file"
+
+    def exists(self, fname):
+        return exists(fname)
+
+    def store(self, ts, fname, params):
+        store(ts, fname)
+        return fname
+
+class ColumnarFile(object):
+    "append task sets to a columnar container (see columnar.py)"
+
+    def __init__(self, container):
+        self.writer = ColumnarWriter(container)
+
+    def exists(self, fname):
+        return taskset_name(fname) in self.writer.names
+
+    def store(self, ts, fname, params):
+        return self.add(taskset_name(fname), to_data(ts), params)
+
+    def add(self, name, data, params):
+        print '=> %s[%s]' % (self.writer.fname, name)
+        self.writer.append(name, data)
+        return self.writer.fname
+
+    def close(self):
+        self.writer.close()
+
+class JSONArchive(object):
+    "append task sets to a streaming JSONL archive (see archive.py)"
+
+    def __init__(self, fname, shard_size=None):
+        self.writer = ArchiveWriter(fname, shard_size)
+
+    def exists(self, fname):
+        return taskset_name(fname) in self.writer.names
+
+    def store(self, ts, fname, params):
+        return self.add(taskset_name(fname), to_data(ts), params)
+
+    def add(self, name, data, params):
+        shard = self.writer.append(name, data, params)
+        print '=> %s[%s]' % (shard, name)
+        return shard
+
+    def close(self):
+        self.writer.close()
+
+class Indexed(object):
+    "record everything stored in another sink in a manifest (see manifest.py)"
+
+    def __init__(self, sink, manifest):
+        self.sink = sink
+        self.manifest = manifest
+
+    def exists(self, fname):
+        return self.manifest.exists(taskset_name(fname)) or \
+            self.sink.exists(fname)
+
+    def store(self, ts, fname, params):
+        where = self.sink.store(ts, fname, params)
+        self.manifest.record(taskset_name(fname), where, params, to_data(ts))
+        return where
+
+class Collector(object):
+    """keep task sets in memory, e.g., to hand them from a worker process to
+    the parent process, which then adds them to a shared sink or manifest
+
+    If a local sink is given, task sets are also stored there right away."""
+
+    def __init__(self, known=(), local=None):
+        self.known = known
+        self.local = local
+        self.sets  = []
+
+    def exists(self, fname):
+        return taskset_name(fname) in self.known or \
+            (self.local is not None and self.local.exists(fname))
+
+    def store(self, ts, fname, params):
+        where = None
+        if self.local is not None:
+            where = self.local.store(ts, fname, params)
+        self.sets.append((taskset_name(fname), to_data(ts), params, where))
+        return where
+
+def store_random_taskset(m, n, u, seq, prefix='', guided=False,
+                         sink=JSONFiles(), seed=0):
     print "[random laminar APAs, %d cores, %.2f utilization, %d tasks]" \
              % (m, u, n)
     fname = "%sapa-r-workload_m=%02d_n=%02d_u=%2d_seq=%02d.json" % \
         (prefix, m, n, int(100 * u), seq)
-    if exists(fname):
+    if sink.exists(fname):
         print '=> skipped; %s exists already.' % fname
         return
 
-    ts = make_taskset(n, u * m)
-    assign_random_laminar_affinities(ts, m)
+    seed = seed_rng('random', m, n, u, seq, base=seed)
+    ts = make_tasksets(1, n, u * m)[0]
+    assign_random_laminar_affinities(ts, m, guided=guided)
     assign_arm_priorities(ts)
 
-    store(ts, fname)
+    sink.store(ts, fname, dict(apa='random', m=m, n=n, u=u, seq=seq,
+                               seed=seed))
 
-def store_partitioned_taskset(m, n, u, seq, prefix=''):
+def store_partitioned_taskset(m, n, u, seq, prefix='', sink=JSONFiles(),
+                              seed=0, rta=False):
     print "[pre-partitioned, %d cores, %.2f utilization, %.2f tasks per core]" \
          % (m, u, n / m)
     fname = "%spart-workload_m=%02d_n=%02d_u=%2d_seq=%02d.json" % \
         (prefix, m, n, int(100 * u), seq)
-    if exists(fname):
+    if sink.exists(fname):
         print '=> skipped; %s exists already.' % fname
         return
 
+    seed = seed_rng('partitioned', m, n, u, seq, base=seed)
     ts = TaskSystem()
     npc   = n // m
     extra = n % m
+    if rta:
+        (larger, r1)  = make_rm_schedulable_tasksets(extra, npc + 1, u)
+        (smaller, r2) = make_rm_schedulable_tasksets(m - extra, npc, u)
+        per_core = larger + smaller
+        if None in per_core:
+            print '=> skipped; no task set passed the response-time analysis.'
+            return
+        if r1 + r2:
+            print '=> replaced %d per-core task sets that failed the ' \
+                  'response-time analysis.' % (r1 + r2)
+    else:
+        per_core = make_tasksets(extra, npc + 1, u) + \
+                   make_tasksets(m - extra, npc, u)
     for core in xrange(m):
-        per_core = make_taskset(npc + 1 if core < extra else npc, u)
-        for t in per_core:
+        for t in per_core[core]:
             t.partition = core
-            t.affinity = set([core])
-        ts += per_core
+            t.affinity = 1 << core
+        ts += per_core[core]
+    assign_rm_priorities(ts)
+
+    sink.store(ts, fname, dict(apa='partitioned', m=m, n=n, u=u, seq=seq,
+                               seed=seed))
+
+def store_packed_taskset(m, n, u, seq, partitioner, prefix='', rta=False,
+                         sink=JSONFiles(), seed=0, max_tries=100):
+    print "[%s-partitioned, %d cores, %.2f utilization, %d tasks]" \
+         % (partitioner.upper(), m, u, n)
+    fname = "%spart-%s-workload_m=%02d_n=%02d_u=%2d_seq=%02d.json" % \
+        (prefix, partitioner, m, n, int(100 * u), seq)
+    if sink.exists(fname):
+        print '=> skipped; %s exists already.' % fname
+        return
+
+    # the same task sets for all partitioners
+    seed = seed_rng('packed', m, n, u, seq, base=seed)
+    for _ in xrange(max_tries):
+        ts = make_tasksets(1, n, u * m)[0]
+        cores = partition(ts, m, partitioner, rta)
+        if cores is not None:
+            break
+    else:
+        print '=> skipped; no task set could be partitioned in %d tries.' \
+            % max_tries
+        return
+    for (t, core) in zip(ts, cores):
+        t.partition = core
+        t.affinity = 1 << core
     assign_rm_priorities(ts)
 
-    store(ts, fname)
+    sink.store(ts, fname, dict(apa='partitioned', partitioner=partitioner,
+                               m=m, n=n, u=u, seq=seq, seed=seed))
 
-def store_socket_taskset(m, sockets, n, u, seq, prefix=''):
+def store_socket_taskset(m, sockets, n, u, seq, prefix='', guided=False,
+                         sink=JSONFiles(), seed=0, socket_sizes=None):
     print "[socket-aware laminar APAs, %d cores, %d sockets, %.2f utilization, %d tasks]" \
          % (m, sockets, u, n)
     fname = "%sapa-s-workload_m=%02d_s=%02d_n=%02d_u=%2d_seq=%02d.json" % \
         (prefix, m, sockets, n, int(100 * u), seq)
-    if exists(fname):
+    if sink.exists(fname):
         print '=> skipped; %s exists already.' % fname
         return
 
-    ts = make_taskset(n, u)
-    assign_three_level_affinities(ts, m, sockets)
+    seed = seed_rng('socket', m, n, u, seq, sockets, base=seed)
+    ts = make_tasksets(1, n, u)[0]
+    assign_three_level_affinities(ts, m, sockets, guided=guided,
+                                  socket_sizes=socket_sizes)
     assign_rm_priorities(ts)
 
-    store(ts, fname)
+    sink.store(ts, fname, dict(apa='socket', m=m, s=sockets, n=n, u=u,
+                               seq=seq, seed=seed))
 
 def parse_args():
     p = argparse.ArgumentParser(
@@ -248,44 +531,198 @@ def parse_args():
             dest='apa_type', default='partitioned',
         help='what sort of affinities to generate [default: partitioned]')
 
+    p.add_argument(
+        '--guided', action='store_true', dest='guided', default=False,
+        help='pick random affinities only among those that keep the task '
+             'set feasible')
+
+    p.add_argument(
+        '--partitioner', type=str, choices=sorted(HEURISTICS),
+            dest='partitioner', default=None,
+        help='with --apa partitioned, generate one task set for all cores '
+             'and partition it with first-, best-, or worst-fit decreasing '
+             'instead of generating one per core')
+    p.add_argument(
+        '--rta', action='store_true', dest='rta', default=False,
+        help='with --apa partitioned, replace per-core task sets that are '
+             'not schedulable with rate-monotonic priorities according to '
+             'response-time analysis; with --partitioner, use '
+             'response-time analysis to admit tasks to cores')
+
+    p.add_argument(
+        '--topology', type=str, dest='topology', default=None,
+        help='take socket sizes from the CPU topology in this sysfs-like '
+             'directory or saved topology file (see topology.py) '
+             'instead of -s')
+
     p.add_argument(
         '-c', '--count', type=pos_int, dest='count', default=1,
         help='how many task sets per #cores, #tasks, and util')
 
-    return p.parse_args()
+    out = p.add_mutually_exclusive_group()
+    out.add_argument(
+        '--columnar', type=str, dest='columnar', default=None,
+        help='append the task sets to this columnar container '
+             'instead of writing individual JSON files')
+    out.add_argument(
+        '--archive', type=str, dest='archive', default=None,
+        help='append the task sets to this JSONL archive '
+             'instead of writing individual JSON files')
+    p.add_argument(
+        '--manifest', type=str, dest='manifest', default=None,
+        help='record all task sets in this SQLite manifest '
+             'and consult it to skip existing ones')
+    p.add_argument(
+        '--shard-size', type=pos_int, dest='shard_size', default=None,
+        help='start a new archive shard after this many MiB')
 
-def mktasks(m, u, n, apa_type='partitioned', nsockets=[1], seqno=0, prefix=''):
-    if apa_type == 'partitioned':
-        store_partitioned_taskset(m, n, u, seqno, prefix=prefix)
+    p.add_argument(
+        '-j', '--jobs', type=pos_int, dest='jobs', default=1,
+        help='how many task sets to generate in parallel [default: 1]')
+    p.add_argument(
+        '--seed', type=int, dest='seed', default=0,
+        help='base seed from which the per-task-set seeds are derived')
+
+    options = p.parse_args()
+    if options.rta and options.apa_type != 'partitioned':
+        p.error('--rta requires --apa partitioned')
+    if options.partitioner and options.apa_type != 'partitioned':
+        p.error('--partitioner requires --apa partitioned')
+    if options.shard_size and not options.archive:
+        p.error('--shard-size requires --archive')
+    return options
+
+def mktasks(m, u, n, apa_type='partitioned', nsockets=[1], seqno=0, prefix='',
+            seed=0, guided=False, socket_sizes=None, rta=False,
+            partitioner=None, sink=JSONFiles()):
+    if apa_type == 'partitioned' and partitioner:
+        store_packed_taskset(m, n, u, seqno, partitioner, prefix=prefix,
+                             rta=rta, sink=sink, seed=seed)
+    elif apa_type == 'partitioned':
+        store_partitioned_taskset(m, n, u, seqno, prefix=prefix, sink=sink,
+                                  seed=seed, rta=rta)
     elif apa_type == 'random':
-        store_random_taskset(m, n, u, seqno, prefix=prefix)
+        store_random_taskset(m, n, u, seqno, prefix=prefix, guided=guided,
+                             sink=sink, seed=seed)
     elif apa_type == 'socket':
         for s in nsockets:
             if s <= m:
-                store_socket_taskset(m, s, n, u, seqno, prefix=prefix)
+                store_socket_taskset(m, s, n, u, seqno, prefix=prefix,
+                                     guided=guided, sink=sink, seed=seed,
+                                     socket_sizes=socket_sizes)
     else:
         assert False
 
-def main(args=sys.argv[1:]):
-    options = parse_args()
-
-    prefix_dir = dirname(options.prefix)
-    if prefix_dir and not exists(prefix_dir):
-        makedirs(prefix_dir)
+# In worker processes: names of the task sets that are known to exist
+# already, and the sink in which workers store task sets themselves (if any).
+KNOWN_TASKSETS = frozenset()
+LOCAL_SINK = None
+
+def init_worker(known, local):
+    global KNOWN_TASKSETS, LOCAL_SINK
+    KNOWN_TASKSETS = known
+    LOCAL_SINK = local
+
+def mktasks_job(args):
+    collector = Collector(KNOWN_TASKSETS, LOCAL_SINK)
+    mktasks(*args, sink=collector)
+    return collector.sets
+
+def generation_jobs(options):
+    "expand the parameter grid into a list of mktasks() argument tuples"
+    if options.apa_type == 'socket':
+        # one job per socket count so that they can run in parallel, too
+        socket_choices = [[s] for s in options.nsockets]
+    else:
+        socket_choices = [options.nsockets]
 
+    jobs = []
     for m in options.ncores:
+        socket_sizes = None
+        if options.topology and options.apa_type == 'socket':
+            # the sockets that the first m logical cores belong to
+            socket_sizes = tuple(options.topology.socket_sizes(m))
+            socket_choices = [[len(socket_sizes)]]
         for u in options.utils:
             if u > 1:
                 # A per-core utilization > 1 doesn't make sense; assume the
                 # user meant percent.
                 u = u/100
             for seq in xrange(options.count):
-                for n in options.ntasks:
-                    mktasks(m, u, n,
-                        options.apa_type, options.nsockets, seq, options.prefix)
-                for t in options.ntasks_per_core:
-                    mktasks(m, u, t * m,
-                        options.apa_type, options.nsockets, seq, options.prefix)
+                task_counts = options.ntasks + \
+                    [t * m for t in options.ntasks_per_core]
+                for n in task_counts:
+                    for nsockets in socket_choices:
+                        jobs.append((m, u, n, options.apa_type, nsockets, seq,
+                                     options.prefix, options.seed,
+                                     options.guided, socket_sizes,
+                                     options.rta, options.partitioner))
+    return jobs
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    prefix_dir = dirname(options.prefix)
+    if prefix_dir and not exists(prefix_dir):
+        makedirs(prefix_dir)
+
+    if options.topology:
+        try:
+            topology = load_topology(options.topology)
+        except (IOError, ValueError), err:
+            print '%s: %s' % (options.topology, err)
+            return
+        if max(options.ncores or [0]) > len(topology):
+            print '%s: topology has only %d cores' % \
+                (options.topology, len(topology))
+            return
+        options.topology = topology
+
+    jobs = generation_jobs(options)
+
+    if options.columnar:
+        sink = ColumnarFile(options.columnar)
+        known = sink.writer.names
+    elif options.archive:
+        try:
+            sink = JSONArchive(options.archive,
+                               options.shard_size * 1024 * 1024
+                               if options.shard_size else None)
+        except (IOError, ValueError), err:
+            print err
+            return
+        known = sink.writer.names
+    else:
+        sink = JSONFiles()
+        known = set()
+
+    manifest = Manifest(options.manifest) if options.manifest else None
+
+    if options.jobs > 1:
+        if manifest:
+            known = known | manifest.names()
+        # Workers write JSON files themselves; everything else is funneled
+        # through the parent process.
+        local = sink if isinstance(sink, JSONFiles) else None
+        pool = Pool(options.jobs, init_worker, (known, local))
+        # ordered, so that shared sinks are filled deterministically
+        for sets in pool.imap(mktasks_job, jobs):
+            for (name, data, params, where) in sets:
+                if where is None:
+                    where = sink.add(name, data, params)
+                if manifest:
+                    manifest.record(name, where, params, data)
+        pool.close()
+        pool.join()
+    else:
+        indexed = Indexed(sink, manifest) if manifest else sink
+        for job in jobs:
+            mktasks(*job, sink=indexed)
+
+    if not isinstance(sink, JSONFiles):
+        sink.close()
+    if manifest:
+        manifest.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# Summary statistics for the overhead samples extracted by Feather-Trace.
+#
+# Sample files (raw float32 arrays) are memory-mapped and processed in
+# chunks, so memory usage is bounded irrespective of their size. Count,
+# minimum, maximum, mean, and standard deviation are exact. A percentile is
+# exact if the samples above it fit into the memory budget, which is the
+# case for high percentiles such as 99.99; other percentiles are computed
+# from an evenly strided subsample and flagged as approximate.
+
+from __future__ import division
+
+import argparse
+import csv
+import re
+import sys
+
+from glob import glob
+from os.path import basename, isdir, join, getsize
+
+import numpy
+
+SAMPLE_FILE = re.compile(
+    r'^(?P<combined>combined-)?overheads_host=(?P<host>.+?)_trace=(?P<name>.+?)'
+    r'(?:_(?P<kind>msg|cpu)=(?P<id>[^_]+))?_overhead=(?P<overhead>[^_]+)\.float32$')
+
+DEFAULT_PERCENTILES = [50, 90, 95, 99, 99.9, 99.99]
+
+SAMPLE_SIZE = 4
+
+def parse_sample_file(fname):
+    "(experiment, host, scope, overhead) for a sample file, or None"
+    match = SAMPLE_FILE.match(basename(fname))
+    if not match:
+        return None
+    if match.group('kind'):
+        scope = '%s=%s' % (match.group('kind'), match.group('id'))
+    else:
+        scope = 'all'
+    return (match.group('name'), match.group('host'), scope,
+            match.group('overhead'))
+
+def percentile_at(sorted_values, first_rank, n, p):
+    """linearly interpolated p-th percentile of n samples, given the samples
+    of rank first_rank and above in ascending order"""
+    r = p / 100 * (n - 1)
+    lo = int(r)
+    hi = min(lo + 1, n - 1)
+    v_lo = sorted_values[lo - first_rank]
+    v_hi = sorted_values[hi - first_rank]
+    return float(v_lo + (r - lo) * (v_hi - v_lo))
+
+def sample_stats(fname, percentiles=DEFAULT_PERCENTILES, budget=1 << 22,
+                 chunk=1 << 20):
+    """statistics of the samples in fname as a dict; 'approx' lists the
+    percentiles computed from a subsample"""
+    n = getsize(fname) // SAMPLE_SIZE
+    stats = {'count' : n, 'approx' : []}
+    if n == 0:
+        return stats
+    data = numpy.memmap(fname, dtype='<f4', mode='r', shape=(n,))
+
+    # How many of the largest samples are needed for each exact percentile?
+    tail = 0
+    exact = []
+    for p in percentiles:
+        k = n - int(p / 100 * (n - 1))
+        if k <= budget:
+            exact.append(p)
+            tail = max(tail, k)
+        else:
+            stats['approx'].append(p)
+    stride = max(1, -(-n // budget)) if stats['approx'] else None
+
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    vmin = numpy.inf
+    vmax = -numpy.inf
+    largest = numpy.empty(0, dtype='<f4')
+    subsample = []
+    for start in xrange(0, n, chunk):
+        block = numpy.asarray(data[start:start + chunk], dtype=numpy.float64)
+        # merge the chunk's moments (Chan et al.)
+        b_count = len(block)
+        b_mean  = block.mean()
+        b_m2    = ((block - b_mean) ** 2).sum()
+        delta   = b_mean - mean
+        total   = count + b_count
+        mean   += delta * b_count / total
+        m2     += b_m2 + delta ** 2 * count * b_count / total
+        count   = total
+        vmin = min(vmin, block.min())
+        vmax = max(vmax, block.max())
+
+        if tail:
+            largest = numpy.concatenate((largest, data[start:start + chunk]))
+            if len(largest) > tail:
+                largest = numpy.partition(largest, len(largest) - tail)[-tail:]
+        if stride:
+            # keep the global stride across chunk boundaries
+            subsample.append(numpy.array(data[start + (-start % stride):
+                                              start + chunk:stride]))
+
+    stats['min']  = float(vmin)
+    stats['max']  = float(vmax)
+    stats['mean'] = float(mean)
+    stats['std']  = float(numpy.sqrt(m2 / count))
+
+    if tail:
+        largest.sort()
+        for p in exact:
+            stats[p] = percentile_at(largest, n - len(largest), n, p)
+    if stride:
+        subsample = numpy.concatenate(subsample)
+        for p in stats['approx']:
+            stats[p] = float(numpy.percentile(subsample, p))
+
+    del data
+    return stats
+
+def find_sample_files(paths):
+    files = []
+    for path in paths:
+        if isdir(path):
+            files += glob(join(path, '*overheads_host=*_overhead=*.float32'))
+        else:
+            files.append(path)
+    return sorted(f for f in files if parse_sample_file(f))
+
+def format_percentile(p):
+    return 'p%s' % ('%g' % p)
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Compute summary statistics of overhead samples')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        'paths', nargs='*', type=str, metavar='samples',
+        default=['overhead-samples', '.'],
+        help='sample files or directories containing them '
+             '[default: overhead-samples/ and the current directory]')
+
+    p.add_argument(
+        '-p', '--percentiles', type=float, nargs='*', dest='percentiles',
+        default=DEFAULT_PERCENTILES,
+        help='percentiles to report [default: %s]' %
+             ' '.join('%g' % x for x in DEFAULT_PERCENTILES))
+    p.add_argument(
+        '--budget', type=pos_int, dest='budget', default=1 << 22,
+        help='how many samples per file to hold in memory at most '
+             '[default: 4194304]')
+    p.add_argument(
+        '-o', '--output', type=str, dest='output', default=None,
+        help='write the table to this CSV file [default: stdout]')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    out = open(options.output, 'wb') if options.output else sys.stdout
+    table = csv.writer(out)
+    table.writerow(['experiment', 'host', 'scope', 'overhead', 'count',
+                    'min', 'max', 'mean', 'std'] +
+                   [format_percentile(p) for p in options.percentiles] +
+                   ['approx', 'file'])
+
+    for fname in find_sample_files(options.paths):
+        (name, host, scope, overhead) = parse_sample_file(fname)
+        try:
+            stats = sample_stats(fname, options.percentiles, options.budget)
+        except (IOError, ValueError), err:
+            print >>sys.stderr, '%s: %s' % (fname, err)
+            continue
+        table.writerow([name, host, scope, overhead, stats['count']] +
+                       [stats.get(k, '') for k in ('min', 'max', 'mean', 'std')] +
+                       [stats.get(p, '') for p in options.percentiles] +
+                       [' '.join(format_percentile(p) for p in stats['approx']),
+                        fname])
+
+    if options.output:
+        out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+# Bin-packing heuristics for partitioning task sets onto cores.
+#
+# Tasks are considered in order of decreasing utilization and each is
+# placed on a core chosen by the heuristic among those with enough spare
+# capacity: the first one (first-fit), the one with the least spare
+# capacity (best-fit), or the one with the most (worst-fit). The spare
+# capacities are kept in a max segment tree, a sorted list, and a heap,
+# respectively, so that finding a core does not require a scan over all
+# cores.
+#
+# Optionally, a core only admits a task if its tasks remain schedulable
+# with rate-monotonic priorities according to response-time analysis. The
+# cores with enough spare capacity are then tried in the heuristic's order
+# until one admits the task. Cores admit the task without RTA if they pass
+# the hyperbolic bound (a sufficient condition). Otherwise, two cached
+# quantities rule out most cores without RTA: for each priority level, the
+# most idle time that the higher-priority tasks leave up to each of their
+# releases, which decides exactly whether the new task meets its deadline,
+# and the largest fraction of time that each task leaves idle, which the
+# new task's utilization must not exceed for any task that it delays. Both
+# only change for the tasks after a newly admitted one. The response times
+# of the core's tasks are known from admitting them, which yields lower
+# bounds on the response times with the new task. These rule out further
+# cores, and the RTA of the remaining ones (in batches of increasing size,
+# see rta.py) starts from them.
+
+from __future__ import division
+
+from bisect import bisect_left, bisect_right, insort
+from heapq import heappush, heappop
+
+import numpy
+
+from feasibility import EPSILON
+from rta import rta_schedulable, response_times, as_batch, rm_order
+
+class FirstFit(object):
+    "cores with enough spare capacity by index"
+
+    def __init__(self, m):
+        self.size = 1
+        while self.size < m:
+            self.size *= 2
+        # max of the spare capacities in each subtree; padding never fits
+        self.tree = [-1.0] * (2 * self.size)
+        for core in xrange(m):
+            self.tree[self.size + core] = 1.0
+        for node in xrange(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def candidates(self, u):
+        # depth first, left to right, skipping subtrees that cannot fit u
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if self.tree[node] < u - EPSILON:
+                continue
+            if node >= self.size:
+                yield node - self.size
+            else:
+                stack.append(2 * node + 1)
+                stack.append(2 * node)
+
+    def take(self, core, u):
+        node = self.size + core
+        self.tree[node] -= u
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+class BestFit(object):
+    "cores with enough spare capacity by increasing spare capacity"
+
+    def __init__(self, m):
+        # (spare capacity, core), sorted
+        self.spare = [(1.0, core) for core in xrange(m)]
+        self.of    = [1.0] * m
+
+    def candidates(self, u):
+        for i in xrange(bisect_left(self.spare, (u - EPSILON,)),
+                        len(self.spare)):
+            yield self.spare[i][1]
+
+    def take(self, core, u):
+        cap = self.of[core]
+        del self.spare[bisect_left(self.spare, (cap, core))]
+        self.of[core] = cap - u
+        insort(self.spare, (cap - u, core))
+
+class WorstFit(object):
+    "cores with enough spare capacity by decreasing spare capacity"
+
+    def __init__(self, m):
+        # (-spare capacity, core); ties go to the lowest-numbered core.
+        # Outdated entries are left in place and skipped.
+        self.heap = [(-1.0, core) for core in xrange(m)]
+        self.of   = [1.0] * m
+
+    def candidates(self, u):
+        # walk the heap in order without modifying it
+        frontier = [(self.heap[0], 0)] if self.heap else []
+        while frontier:
+            ((neg_cap, core), i) = heappop(frontier)
+            if -neg_cap < u - EPSILON:
+                break
+            if -neg_cap == self.of[core]:
+                yield core
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap):
+                    heappush(frontier, (self.heap[child], child))
+
+    def take(self, core, u):
+        self.of[core] -= u
+        heappush(self.heap, (-self.of[core], core))
+        while -self.heap[0][0] != self.of[self.heap[0][1]]:
+            heappop(self.heap)
+
+HEURISTICS = {
+    'ffd' : FirstFit,
+    'bfd' : BestFit,
+    'wfd' : WorstFit,
+}
+
+def idle_times(costs, periods, period):
+    """the times up to period at which tasks with the given costs and periods
+    are released (after 0), and period itself, with the time that the tasks
+    leave idle up to each of them"""
+    if not len(costs):
+        return (numpy.array([period]), numpy.array([period]))
+    costs   = numpy.asarray(costs, dtype=numpy.int64)
+    periods = numpy.asarray(periods, dtype=numpy.int64)
+    # all releases before period, in order of time
+    counts = -(-period // periods)
+    k = numpy.arange(counts.sum()) - \
+        numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    releases = numpy.repeat(periods, counts) * k
+    order = numpy.argsort(releases, kind='mergesort')
+    releases = releases[order]
+    demand = numpy.cumsum(numpy.repeat(costs, counts)[order])
+    # Demand is constant between releases, so the idle time within each such
+    # interval is largest at its end.
+    points = numpy.append(releases[releases > 0], period)
+    demand = demand[numpy.searchsorted(releases, points) - 1]
+    return (points, points - demand)
+
+class Core(object):
+    """the tasks on a core in RM priority order and their response times,
+    which help to rule out (or analyze) additional tasks quickly"""
+
+    def __init__(self):
+        self.tasks   = []
+        self.periods = []
+        self.costs   = []
+        self.resp    = []
+        # total cost and utilization of the first i tasks
+        self.hp_cost = [0]
+        self.hp_util = [0.0]
+        # minimum slack (period - response time) of the last len - i tasks
+        self.min_slack = [float('inf')]
+        # product of (1 + utilization) for the hyperbolic bound
+        self.bound = 1.0
+        # for each task, the points up to its period at which the tasks
+        # before it are released and the most idle time they leave up to
+        # each point, and the largest fraction of time that the task and
+        # those before it leave idle (see levels())
+        self.points   = []
+        self.max_idle = []
+        self.idle     = []
+        self.min_idle = None
+        # the same for a task after all others, up to some horizon
+        self.last = None
+
+    def lower_bounds(self, t):
+        """lower bounds on the response times with t added, or None if they
+        already rule out t"""
+        # t goes after the tasks with the same period
+        i = bisect_right(self.periods, t.period)
+        if t.cost > self.min_slack[i] or self.hp_util[i] >= 1:
+            return None
+        # R >= C + sum of hp costs, and R >= C + R * (hp utilization)
+        own = max(t.cost + self.hp_cost[i],
+                  int(t.cost / (1 - self.hp_util[i])))
+        if own > t.period:
+            return None
+        if not self.surely_admits(t):
+            # t takes up at least its utilization of any interval, which
+            # the later tasks must leave idle
+            if t.utilization() > self.levels()[i] + EPSILON:
+                return None
+            if not self.meets_deadline(i, t):
+                return None
+        lower = [r + t.cost * -(-r // t.period) for r in self.resp[i:]]
+        if any(r > p for (r, p) in zip(lower, self.periods[i:])):
+            return None
+        return self.resp[:i] + [own] + lower
+
+    def meets_deadline(self, i, t):
+        """whether t meets its deadline when added before the i-th task, that
+        is, whether the tasks before it leave it enough idle time"""
+        if i < len(self.tasks):
+            self.levels()
+            (points, max_idle) = (self.points[i], self.max_idle[i])
+        else:
+            if self.last is None or self.last[0][-1] < t.period:
+                (points, idle) = idle_times(self.costs, self.periods,
+                                            2 * t.period)
+                self.last = (points, numpy.maximum.accumulate(idle))
+            (points, max_idle) = self.last
+        j = numpy.searchsorted(points, t.period, 'right')
+        idle = max_idle[j - 1] if j else 0
+        demand = sum(c * -(-t.period // p)
+                     for (c, p) in zip(self.costs[:i], self.periods[:i]))
+        return max(idle, t.period - demand) >= t.cost
+
+    def levels(self):
+        """the minimum over the i-th and each later task of the largest
+        fraction of time that it and the tasks before it leave idle up to
+        its period; a task with a greater utilization added before it makes
+        one of them miss its deadline"""
+        if self.min_idle is None:
+            # only the tasks after the last one added have changed
+            for i in xrange(len(self.idle), len(self.tasks)):
+                (points, idle) = idle_times(self.costs[:i], self.periods[:i],
+                                            self.periods[i])
+                self.points.append(points)
+                self.max_idle.append(numpy.maximum.accumulate(idle))
+                self.idle.append(((idle - self.costs[i]) / points).max())
+            self.min_idle = list(numpy.minimum.accumulate(self.idle[::-1]))[::-1] + \
+                            [float('inf')]
+        return self.min_idle
+
+    def with_task(self, t):
+        return rm_order(self.tasks + [t])
+
+    def add(self, t, lower):
+        i = bisect_right(self.periods, t.period)
+        del self.points[i:]
+        del self.max_idle[i:]
+        del self.idle[i:]
+        self.last = None
+        self.min_idle = None
+        self.tasks = self.with_task(t)
+        self.periods = [x.period for x in self.tasks]
+        self.costs   = [x.cost for x in self.tasks]
+        (costs, periods) = as_batch([self.tasks])
+        self.resp = list(response_times(costs, periods, [lower])[0])
+        self.bound *= 1 + t.utilization()
+        self.hp_cost = [0] + list(numpy.cumsum(costs[0]))
+        self.hp_util = [0.0] + list(numpy.cumsum(costs[0] / periods[0]))
+        slack = periods[0] - self.resp
+        self.min_slack = list(numpy.minimum.accumulate(slack[::-1]))[::-1] + \
+                         [float('inf')]
+
+    def surely_admits(self, t):
+        return self.bound * (1 + t.utilization()) <= 2
+
+def first_admitting(candidates, on_core, t, batch=8, max_batch=128):
+    """(core, lower bounds on its response times) for the first of the
+    candidate cores that remains RM-schedulable with t, or None"""
+    candidates = ((c, on_core[c].lower_bounds(t)) for c in candidates)
+    candidates = ((c, lower) for (c, lower) in candidates if lower)
+    while True:
+        cores = []
+        for (core, lower) in candidates:
+            cores.append((core, lower))
+            if on_core[core].surely_admits(t) or len(cores) == batch:
+                break
+        if not cores:
+            return None
+        if on_core[cores[-1][0]].surely_admits(t):
+            need_rta = cores[:-1]
+        else:
+            need_rta = cores
+        if need_rta:
+            (costs, periods) = as_batch([on_core[c].with_task(t)
+                                         for (c, _) in need_rta])
+            start = numpy.zeros(costs.shape, dtype=numpy.int64)
+            for (row, (_, lower)) in enumerate(need_rta):
+                start[row, :len(lower)] = lower
+            ok = rta_schedulable(costs, periods, start)
+            for (candidate, passed) in zip(need_rta, ok):
+                if passed:
+                    return candidate
+        if len(need_rta) < len(cores):
+            return cores[-1]
+        batch = min(2 * batch, max_batch)
+
+def partition(tasks, m, heuristic='ffd', rta=False):
+    """the core of each task, or None if some task could not be placed;
+    with rta, cores admit only tasks that keep them RM-schedulable"""
+    bins = HEURISTICS[heuristic](m)
+    on_core = [Core() for _ in xrange(m)]
+    cores = [None] * len(tasks)
+    for i in sorted(xrange(len(tasks)), key=lambda i: -tasks[i].utilization()):
+        t = tasks[i]
+        u = t.utilization()
+        if rta:
+            (core, lower) = first_admitting(bins.candidates(u), on_core, t) \
+                            or (None, None)
+        else:
+            core = next(bins.candidates(u), None)
+        if core is None:
+            return None
+        bins.take(core, u)
+        if rta:
+            on_core[core].add(t, lower)
+        cores[i] = core
+    return cores
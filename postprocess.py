@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+# Process Feather-Trace overhead traces outside of the experiment scripts.
+#
+# This performs the same steps as the scripts generated with mkscript.py -P
+# (sort, extract, move raw files, combine, move sample files; see
+# PROCESS_OVERHEAD_TRACE in templates.py), resulting in the same files and
+# directory layout, but for many experiments concurrently. Completed steps
+# are recorded in a state directory so that an interrupted run can be
+# resumed, and with --watch, traces are processed as experiments finish.
+
+import argparse
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+
+from collections import defaultdict
+from glob import glob
+from multiprocessing.pool import ThreadPool
+from os.path import join, basename, exists, getmtime
+from time import time, sleep
+
+TRACE_FILE = re.compile(
+    r'^overheads_host=(?P<host>.+?)_trace=(?P<name>.+)_(?:msg|cpu)=[^_]+\.bin$')
+
+RAW_DIR     = 'raw-overhead-files'
+SAMPLES_DIR = 'overhead-samples'
+STATE_DIR   = '.postprocess'
+LOG_FILE    = 'overhead-processing.log'
+
+def discover(directory, settle=0):
+    """names of experiments with trace files in the directory, mapped to
+    those files; experiments with recently modified files are omitted"""
+    traces = defaultdict(list)
+    for fname in glob(join(directory, 'overheads_host=*.bin')):
+        match = TRACE_FILE.match(basename(fname))
+        if match:
+            traces[match.group('name')].append(basename(fname))
+    if settle:
+        now = time()
+        for name in traces.keys():
+            if any(now - getmtime(join(directory, f)) < settle
+                   for f in traces[name]):
+                del traces[name]
+    return traces
+
+def matching(directory, pattern, subdir=''):
+    "base names of the files matching the pattern for both msg= and cpu="
+    files = []
+    for kind in ('msg', 'cpu'):
+        files += glob(join(directory, subdir, pattern % kind))
+    return sorted(basename(f) for f in files)
+
+def trace_files(directory, name, subdir=''):
+    return [f for f in matching(directory,
+                                'overheads_host=*_trace=%s_%%s=*.bin' % name,
+                                subdir)
+            if TRACE_FILE.match(f)]
+
+def sample_files(directory, name, subdir=''):
+    return matching(directory,
+                    'overheads_host=*_trace=%s_%%s=*_overhead=*.float32' % name,
+                    subdir)
+
+class Experiment(object):
+    "the processing state of one experiment's traces"
+
+    def __init__(self, directory, name, options):
+        self.directory = directory
+        self.name      = name
+        self.options   = options
+        self.log       = []
+
+    def marker(self, step):
+        return join(self.directory, STATE_DIR, '%s.%s' % (self.name, step))
+
+    def done(self, step):
+        return exists(self.marker(step))
+
+    def mark(self, step):
+        open(self.marker(step), 'w').close()
+
+    def run(self, cmd, files):
+        self.log.append('$ %s [%d files]\n' % (' '.join(cmd), len(files)))
+        p = subprocess.Popen(cmd + files, cwd=self.directory,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        (out, _) = p.communicate()
+        self.log.append(out)
+        if p.returncode != 0:
+            raise RuntimeError('%s failed with exit code %d' %
+                               (cmd[0], p.returncode))
+
+    def move(self, files, subdir):
+        target = join(self.directory, subdir)
+        if not exists(target):
+            try:
+                os.makedirs(target)
+            except OSError:
+                # created concurrently
+                pass
+        for f in files:
+            self.log.append("'%s' -> '%s/%s'\n" % (f, subdir, f))
+            os.rename(join(self.directory, f), join(target, f))
+
+    def process(self):
+        steps = [
+            ('sorted', lambda:
+                self.run(self.options.sort_cmd,
+                         trace_files(self.directory, self.name))),
+            ('extracted', lambda:
+                self.run(self.options.extract_cmd,
+                         trace_files(self.directory, self.name))),
+            ('moved-raw', lambda:
+                self.move(trace_files(self.directory, self.name), RAW_DIR)),
+            ('combined', lambda:
+                self.run(self.options.combine_cmd,
+                         sample_files(self.directory, self.name))),
+            ('moved-samples', lambda:
+                self.move(sample_files(self.directory, self.name), SAMPLES_DIR)),
+        ]
+        if self.options.want_cleanup:
+            steps.append(('cleaned', self.clean_up))
+
+        for (step, action) in steps:
+            if not self.done(step):
+                action()
+                self.mark(step)
+        self.mark('done')
+
+    def clean_up(self):
+        for f in trace_files(self.directory, self.name, RAW_DIR):
+            os.remove(join(self.directory, RAW_DIR, f))
+        for f in sample_files(self.directory, self.name, SAMPLES_DIR):
+            os.remove(join(self.directory, SAMPLES_DIR, f))
+
+def pending(directory, settle=0):
+    "experiments that have trace files or whose processing was interrupted"
+    names = set()
+    for name in discover(directory, settle):
+        if exists(join(directory, STATE_DIR, name + '.moved-raw')):
+            # traces of a repeated experiment; start over
+            for marker in glob(join(directory, STATE_DIR, name + '.*')):
+                os.remove(marker)
+        names.add(name)
+    for marker in glob(join(directory, STATE_DIR, '*.sorted')):
+        names.add(basename(marker)[:-len('.sorted')])
+    return sorted(name for name in names
+                  if not exists(join(directory, STATE_DIR, name + '.done')))
+
+LOG_LOCK = threading.Lock()
+
+def process_experiment(args):
+    (directory, name, options) = args
+    exp = Experiment(directory, name, options)
+    try:
+        exp.process()
+        error = None
+    except (RuntimeError, OSError, IOError), err:
+        error = str(err)
+    with LOG_LOCK:
+        log = open(join(directory, LOG_FILE), 'a')
+        log.write('**** [%s] ****\n' % name)
+        log.write(''.join(exp.log))
+        if error:
+            log.write('Error: %s\n' % error)
+        log.close()
+    return (name, error)
+
+def process_all(directory, options, pool, skip=set()):
+    """process all pending experiments except those to skip; returns the
+    number of experiments processed and the names of those that failed"""
+    names = [name for name in pending(directory, options.settle)
+             if name not in skip]
+    failed = []
+    for (name, error) in pool.imap(process_experiment,
+                                   [(directory, name, options)
+                                    for name in names]):
+        if error:
+            print '%s: %s' % (name, error)
+            failed.append(name)
+        else:
+            print '%s => %s/' % (name, SAMPLES_DIR)
+        sys.stdout.flush()
+    return (len(names), failed)
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Process Feather-Trace overhead traces of many experiments')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        'directory', nargs='?', type=str, default='.',
+        help='where the trace files are [default: current directory]')
+
+    p.add_argument(
+        '-j', '--jobs', type=pos_int, dest='jobs', default=4,
+        help='how many experiments to process concurrently [default: 4]')
+    p.add_argument(
+        '-C', '--clean-up-raw-files', action='store_true', dest='want_cleanup',
+        default=False,
+        help='Remove raw overhead files after processing')
+    p.add_argument(
+        '--settle', type=int, dest='settle', default=10,
+        help='ignore experiments with trace files modified within this many '
+             'seconds [default: 10]')
+    p.add_argument(
+        '--watch', type=pos_int, dest='watch', default=None, metavar='SECONDS',
+        help='keep processing newly finished experiments, '
+             'checking every SECONDS seconds')
+
+    p.add_argument(
+        '--sort-cmd', type=shlex.split, dest='sort_cmd',
+        default=['ft-sort-traces'],
+        help='command used to sort traces [default: ft-sort-traces]')
+    p.add_argument(
+        '--extract-cmd', type=shlex.split, dest='extract_cmd',
+        default=['ft-extract-samples'],
+        help='command used to extract samples [default: ft-extract-samples]')
+    p.add_argument(
+        '--combine-cmd', type=shlex.split, dest='combine_cmd',
+        default=['ft-combine-samples', '--std'],
+        help='command used to combine samples '
+             '[default: ft-combine-samples --std]')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    state = join(options.directory, STATE_DIR)
+    if not exists(state):
+        os.makedirs(state)
+
+    pool = ThreadPool(options.jobs)
+    total = 0
+    failed = set()
+    try:
+        while True:
+            # don't retry failed experiments while watching
+            (n, f) = process_all(options.directory, options, pool, failed)
+            total += n
+            failed.update(f)
+            if not options.watch:
+                break
+            sleep(options.watch)
+    except KeyboardInterrupt:
+        print 'Interrupted; run again to resume.'
+    pool.close()
+    pool.join()
+
+    print '%d experiments processed, %d failed.' % (total, len(failed))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
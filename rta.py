@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Exact response-time analysis (RTA) for uniprocessor fixed-priority
+# scheduling of sporadic tasks with implicit deadlines, as needed to check
+# partitioned (P-FP) task sets core by core.
+#
+# The classic fixed-point iteration
+#
+#   R_i = C_i + sum_{j < i} ceil(R_i / T_j) * C_j
+#
+# is carried out for many task sets at once: a batch of k task sets with up
+# to n tasks each is given as k x n arrays of costs and periods, each row
+# ordered by decreasing priority and padded at the end with zero-cost tasks
+# (which are ignored). All response times of all rows are updated in each
+# round; rows drop out of the batch as soon as they have converged or a
+# response time exceeds its deadline.
+
+from __future__ import division
+
+import numpy
+
+def response_times(costs, periods, start=None):
+    """worst-case response times of a batch of task sets (k x n arrays, rows
+    in priority order); once a response time exceeds its period, the
+    analysis of its row stops, and the row holds only lower bounds. The
+    iteration starts from start if given, which must hold lower bounds."""
+    costs   = numpy.atleast_2d(numpy.asarray(costs, dtype=numpy.int64))
+    periods = numpy.atleast_2d(numpy.asarray(periods, dtype=numpy.int64))
+    (k, n) = costs.shape
+    # interference of j on i only if j has higher priority
+    higher = numpy.tri(n, n, -1, dtype=numpy.int64).T
+    real = costs > 0
+
+    # start at the sum of higher-priority costs, a lower bound on R_i
+    resp = (costs + costs.dot(higher)) * real
+    if start is not None:
+        resp = numpy.maximum(resp, start)
+    active = numpy.arange(k)
+    while len(active):
+        c = costs[active]
+        t = periods[active]
+        r = resp[active]
+        releases = -(-r[:, None, :] // t[:, :, None])
+        new = c + real[active] * \
+              numpy.einsum('kji,kj,ji->ki', releases, c, higher)
+        resp[active] = new
+        done = (new == r).all(axis=1) | (new > t).any(axis=1)
+        active = active[~done]
+    return resp
+
+def rta_schedulable(costs, periods, start=None):
+    "which of the task sets in the batch pass the RTA (see response_times())"
+    costs   = numpy.atleast_2d(numpy.asarray(costs, dtype=numpy.int64))
+    periods = numpy.atleast_2d(numpy.asarray(periods, dtype=numpy.int64))
+    return (response_times(costs, periods, start) <= periods).all(axis=1)
+
+def as_batch(tasksets):
+    "costs and periods of task sets (lists of tasks in priority order)"
+    n = max([len(ts) for ts in tasksets] + [1])
+    costs   = numpy.zeros((len(tasksets), n), dtype=numpy.int64)
+    periods = numpy.ones((len(tasksets), n), dtype=numpy.int64)
+    for (i, ts) in enumerate(tasksets):
+        costs[i, :len(ts)]   = [t.cost for t in ts]
+        periods[i, :len(ts)] = [t.period for t in ts]
+    return (costs, periods)
+
+def rm_order(ts):
+    "the tasks in rate-monotonic priority order (as by assign_ids_by_period)"
+    return sorted(ts, key=lambda t: t.period)
+
+def uniprocessor_schedulable(tasksets, order=rm_order):
+    """which of the (uniprocessor) task sets are schedulable with the
+    priorities given by order"""
+    if not tasksets:
+        return numpy.zeros(0, dtype=bool)
+    return rta_schedulable(*as_batch([order(ts) for ts in tasksets]))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+# Split generated experiment scripts into shards of about equal total run
+# time, to run them on several identical machines in parallel. Each shard
+# gets its own campaign driver (see mkscript.py --campaign).
+#
+# The wall time of each experiment is estimated from its script: the
+# duration, the number of tasks, which tracers it starts, and whether it
+# processes overhead traces afterwards. Measured times from the results of
+# earlier campaigns take precedence over estimates. Experiments are then
+# assigned to shards longest first, each to the shard with the least total
+# time so far (LPT scheduling).
+
+import argparse
+import csv
+import re
+import sys
+
+from heapq import heappush, heappop
+from os import makedirs
+from os.path import basename, dirname, exists
+
+from topology import load_topology
+
+# Estimated time (in seconds) spent on switching schedulers, launching
+# background tasks, and tearing down
+SETUP_TIME = 5
+# ... on launching each task and waiting for it to be ready
+TASK_LAUNCH_TIME = 0.1
+# ... on starting up, waiting for, and flushing each tracer
+TRACER_TIME = 3
+# ... on processing overhead traces, per task and second of tracing
+PROCESSING_TIME = 0.05
+
+SCRIPT_DURATION  = re.compile(r'^DURATION=(\d+)$')
+SCRIPT_SCHEDULER = re.compile(r'^echo "Running .* seconds under (\S+)\.\.\."$')
+SCRIPT_TASKS     = re.compile(r'^release_ts -f (\d+)$')
+
+SCRIPT_TRACERS = [
+    ('ft_trace',    re.compile(r'\bft-trace-overheads -s ')),
+    ('sched_trace', re.compile(r'\bst_trace -s ')),
+    ('debug_log',   re.compile(r'/dev/litmus/log ')),
+]
+SCRIPT_PROCESSING = re.compile(r'^ft-sort-traces ')
+
+def script_info(fname):
+    """the duration, scheduler, number of tasks, tracers, and whether traces
+    are processed, as found in a generated script"""
+    info = dict(duration=0, scheduler=None, tasks=0, tracers=[],
+                processing=False)
+    for line in open(fname, 'r'):
+        line = line.strip()
+        if line.startswith('#'):
+            continue
+        for (key, pattern, conv) in [('duration', SCRIPT_DURATION, int),
+                                     ('scheduler', SCRIPT_SCHEDULER, str),
+                                     ('tasks', SCRIPT_TASKS, int)]:
+            match = pattern.match(line)
+            if match:
+                info[key] = conv(match.group(1))
+        for (tracer, pattern) in SCRIPT_TRACERS:
+            if pattern.search(line) and tracer not in info['tracers']:
+                info['tracers'].append(tracer)
+        if SCRIPT_PROCESSING.match(line):
+            info['processing'] = True
+    if info['scheduler'] is None:
+        raise ValueError('%s: not a generated experiment script' % fname)
+    return info
+
+def experiment_time(info):
+    "estimated wall time of an experiment in seconds"
+    t = SETUP_TIME + info['duration'] + TASK_LAUNCH_TIME * info['tasks'] + \
+        TRACER_TIME * len(info['tracers'])
+    if info['processing']:
+        t += PROCESSING_TIME * info['tasks'] * info['duration']
+    return t
+
+def load_history(fnames):
+    """measured wall times of successful experiments (by script name) from
+    campaign results files; the last run of an experiment counts"""
+    times = {}
+    for fname in fnames:
+        for row in csv.DictReader(open(fname, 'r')):
+            if row['status'] == '0':
+                times[basename(row['experiment'])] = \
+                    int(row['end']) - int(row['start'])
+    return times
+
+def balance(times, n):
+    """distribute (item, time) pairs over n shards by LPT; returns the items
+    of each shard (in their original order) and the shards' total times"""
+    order = dict((item, i) for (i, (item, _)) in enumerate(times))
+    shards = [[] for _ in xrange(n)]
+    loads  = [0] * n
+    heap = [(0, i) for i in xrange(n)]
+    for (item, t) in sorted(times, key=lambda x: -x[1]):
+        (load, i) = heappop(heap)
+        shards[i].append(item)
+        loads[i] = load + t
+        heappush(heap, (loads[i], i))
+    for shard in shards:
+        shard.sort(key=order.get)
+    return (shards, loads)
+
+def plan(scripts, n, history=None):
+    """split scripts into n shards; returns the scripts and estimated total
+    time of each shard, and the scheduler that the scripts use"""
+    if history is None:
+        history = {}
+    times = []
+    schedulers = set()
+    for script in scripts:
+        info = script_info(script)
+        schedulers.add(info['scheduler'])
+        times.append((script, history.get(basename(script),
+                                          experiment_time(info))))
+    if len(schedulers) > 1:
+        raise ValueError('scripts use different schedulers (%s)' %
+                         ', '.join(sorted(schedulers)))
+    (shards, loads) = balance(times, n)
+    return (zip(shards, loads), schedulers.pop() if schedulers else None)
+
+def shard_name(prefix, i, n):
+    return '%s-%0*d.sh' % (prefix, len(str(n)), i + 1)
+
+def format_time(seconds):
+    seconds = int(round(seconds))
+    return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Split experiment scripts into runtime-balanced shards')
+
+    def pos_int(s):
+        v = int(s)
+        if v <= 0:
+             raise argparse.ArgumentTypeError("must be positive")
+        return v
+
+    p.add_argument(
+        'scripts', nargs='+', type=str, metavar='script',
+        help='experiment scripts generated by mkscript.py')
+
+    p.add_argument(
+        '-n', '--shards', type=pos_int, dest='shards', required=True,
+        help='how many shards (machines) to split the experiments into')
+    p.add_argument(
+        '--prefix', type=str, dest='prefix', default='shard',
+        help='name the shards\' drivers PREFIX-1.sh, PREFIX-2.sh, ... '
+             '[default: shard]')
+    p.add_argument(
+        '--history', type=str, nargs='*', dest='history', default=[],
+        help='use the measured times of experiments in these campaign '
+             'results files instead of estimates')
+    p.add_argument(
+        '--topology', type=str, dest='topology', default=None,
+        help='embed the CPU topology read from this sysfs-like directory '
+             'or saved topology file (see topology.py) in the drivers')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    prefix_dir = dirname(options.prefix)
+    if prefix_dir and not exists(prefix_dir):
+        makedirs(prefix_dir)
+
+    # the drivers are regular campaign drivers
+    from mkscript import generate_shards
+
+    try:
+        history = load_history(options.history)
+        topology = load_topology(options.topology) \
+                   if options.topology else None
+        generate_shards(options.prefix, options.scripts, options.shards,
+                        topology, history)
+    except (IOError, ValueError, KeyError), err:
+        print err
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
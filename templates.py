@@ -6,6 +6,7 @@ TRACERS=""
 BG_TASKS=""
 
 DURATION={duration}
+TRACER_TIMEOUT=${{TRACER_TIMEOUT:-{tracer_timeout}}}
 
 echo "Running {name} for $DURATION seconds under {sched}..."
 
@@ -75,6 +76,62 @@ function backup_file()
 	fi
 }}
 
+function tracer_ready_relay()
+{{
+    # Copy the output of tracer $2 (stdin) to the file $1, and report on
+    # fd 3 as soon as the tracer is ready (or when it exits without being
+    # ready).
+    local LINE READY=""
+    while IFS= read -r LINE
+    do
+        echo "$LINE" >> "$1"
+        if [ -z "$READY" ] && [[ "$LINE" == *"Waiting for SIGUSR1"* ]]
+        then
+            READY=1
+            echo "ready $2 $1" >&3
+        fi
+    done
+    [ -n "$READY" ] || echo "failed $2 $1" >&3
+}}
+
+function wait_for_tracers()
+{{
+    # Block until $1 tracers have reported, for at most $TRACER_TIMEOUT seconds.
+    local STATUS NAME OUTPUT I
+    local DEADLINE=$((SECONDS + TRACER_TIMEOUT))
+    for (( I=0; I<$1; I++ ))
+    do
+        if (( DEADLINE <= SECONDS )) || ! read -t $((DEADLINE - SECONDS)) -u 3 STATUS NAME OUTPUT
+        then
+            echo
+            echo "Error: $(($1 - I)) tracer(s) not ready after $TRACER_TIMEOUT seconds."
+            die
+        fi
+        if [ "$STATUS" != "ready" ]
+        then
+            echo
+            echo "Error: $NAME exited before it was ready (see its output in $OUTPUT)."
+            die
+        fi
+    done
+}}
+
+function core_list()
+{{
+    # Map a range list of logical core indices (e.g., 0-3,8) to the
+    # corresponding comma-separated list of CPUs and store it in $1.
+    local LIST=""
+    local R I
+    for R in ${{2//,/ }}
+    do
+        for (( I=${{R%-*}}; I<=${{R#*-}}; I++ ))
+        do
+            LIST="$LIST,${{CORE[$I]}}"
+        done
+    done
+    printf -v "$1" '%s' "${{LIST#,}}"
+}}
+
 function die()
 {{
     cleanup_background
@@ -85,7 +142,10 @@ function die()
 }}
 
 trap 'die' SIGUSR1 SIGTERM SIGINT
+"""
 
+# Checks done only once per campaign.
+CHECK_ENVIRONMENT = """
 # Make sure the scheduler that we want to run actually is available.
 
 if ! grep -q {sched} /proc/litmus/plugins/loaded 2>/dev/null
@@ -103,7 +163,9 @@ then
     echo "Make sure liblitmus is part of the shell's search path."
     die
 fi
+"""
 
+DISCOVER_TOPOLOGY = """
 # Auto-discover cache topology
 
 SOCKETS=`cat /sys/devices/system/cpu/*/topology/physical_package_id | sort | uniq`
@@ -114,17 +176,196 @@ do
 done
 
 declare -a CORE
+declare -a SOCKET_OF
 M=0
 for S in $SOCKETS
 do
 	for C in ${{CPUS_IN_SOCKET[$S]}}
 	do
 		CORE[$M]=$C
+		SOCKET_OF[$M]=$S
 		M=$((M + 1))
 	done
 done
 """
 
+EMBEDDED_TOPOLOGY = """
+# Topology resolved when this script was generated
+
+declare -a CORE=({cores})
+declare -a SOCKET_OF=({sockets})
+
+# Check that it matches this machine (without spawning any processes).
+TOPOLOGY=""
+for F in /sys/devices/system/cpu/*/topology/physical_package_id
+do
+    read S < "$F"
+    F=${{F#/sys/devices/system/cpu/}}
+    TOPOLOGY="$TOPOLOGY ${{F%%/*}}:$S"
+done
+if [ "${{TOPOLOGY# }}" != "{signature}" ]
+then
+    echo "Topology differs from the one assumed when generating this script."
+    unset CORE SOCKET_OF
+{discover}
+fi
+"""
+
+# Experiments run by a campaign driver skip what the driver did already.
+STANDALONE_SETUP = """
+if [ -z "$CAMPAIGN" ]
+then
+{setup}
+fi
+"""
+
+CAMPAIGN_PREAMBLE = """#!/bin/bash
+
+# Run {num_experiments} experiments under {sched} back-to-back.
+
+CAMPAIGN="{name}"
+CAMPAIGN_DIR="$(cd "$(dirname "${{BASH_SOURCE[0]}}")" && pwd)"
+RESULTS="{name}_results.csv"
+JOURNAL="{name}_journal.log"
+ABORT=""
+RESUME=""
+[ "$1" == "--resume" ] && RESUME=1
+
+function die()
+{{
+    setsched Linux
+    exit 1
+}}
+
+function journal()
+{{
+    # Append a tab-separated record to the journal and flush it to disk.
+    local IFS=$'\\t'
+    echo "$*" >> "$JOURNAL"
+    sync "$JOURNAL" 2>/dev/null || sync
+}}
+
+# Stop after the current experiment.
+trap 'ABORT=1' SIGTERM SIGINT
+"""
+
+CAMPAIGN_MAIN = """
+declare -a EXPERIMENTS=(
+{experiments}
+)
+
+function experiment_outputs()
+{{
+    # Store the trace files of experiment $1 (by the tracers' naming
+    # conventions) in the array OUTPUTS.
+    local NAME=${{1##*/}}
+    local DIR
+    local RESTORE=$(shopt -p nullglob)
+    NAME=${{NAME%.sh}}
+    OUTPUTS=()
+    shopt -s nullglob
+    for DIR in "" raw-overhead-files/ overhead-samples/
+    do
+        OUTPUTS+=( "$DIR"*_trace="$NAME"_{{cpu,msg,overhead}}=* "$DIR"*_trace="$NAME".log{{,.gz}} )
+    done
+    eval "$RESTORE"
+}}
+
+function run_experiment()
+{{
+    local START END STATUS F
+    printf -v START '%(%s)T' -1
+    journal start "$1" $START
+    ( source "$CAMPAIGN_DIR/$1" )
+    STATUS=$?
+    printf -v END '%(%s)T' -1
+    echo "$1,$START,$END,$STATUS" >> "$RESULTS"
+    experiment_outputs "$1"
+    for F in "${{OUTPUTS[@]}}"
+    do
+        journal trace "$1" "$F"
+    done
+    # Only an experiment whose traces are on disk counts as completed.
+    sync
+    journal end "$1" $END $STATUS
+    return $STATUS
+}}
+
+function clean_up_experiment()
+{{
+    # Remove what an interrupted or failed run of experiment $1 left behind.
+    local F
+    experiment_outputs "$1"
+    for F in "${{OUTPUTS[@]}}"
+    do
+        rm -f "$F"
+    done
+}}
+
+[ -e "$RESULTS" ] || echo "experiment,start,end,status" > "$RESULTS"
+
+# A crash may have cut off the last record; start a fresh line after it.
+[ -s "$JOURNAL" ] && [ -n "$(tail -c 1 "$JOURNAL")" ] && echo >> "$JOURNAL"
+
+# The state of each experiment (started, completed, or failed) according to
+# the journal
+declare -A STATE
+if [ -n "$RESUME" ] && [ -e "$JOURNAL" ]
+then
+    while IFS=$'\\t' read -r KIND EXP ARG STATUS
+    do
+        case "$KIND" in
+            start) STATE[$EXP]=started ;;
+            end)   [ "$STATUS" == "0" ] && STATE[$EXP]=completed || STATE[$EXP]=failed ;;
+        esac
+    done < "$JOURNAL"
+fi
+
+N=0
+SKIPPED=0
+FAILED=0
+for EXP in "${{EXPERIMENTS[@]}}"
+do
+    if [ -n "$ABORT" ]
+    then
+        echo "Campaign aborted."
+        break
+    fi
+    N=$((N + 1))
+    case "${{STATE[$EXP]}}" in
+        completed)
+            echo "**** [$N/${{#EXPERIMENTS[@]}}] $EXP (completed, skipped) ****"
+            SKIPPED=$((SKIPPED + 1))
+            continue
+            ;;
+        started|failed)
+            echo "Removing the outputs of the previous run of $EXP."
+            clean_up_experiment "$EXP"
+            ;;
+    esac
+    echo "**** [$N/${{#EXPERIMENTS[@]}}] $EXP ****"
+    run_experiment "$EXP" || FAILED=$((FAILED + 1))
+done
+
+[ -n "$RESUME" ] && echo "$SKIPPED experiments completed earlier were skipped."
+echo "$((N - SKIPPED)) experiments run, $FAILED failed. Results recorded in $RESULTS."
+[ "$FAILED" -eq 0 ] && [ -z "$ABORT" ]
+"""
+
+# Tracers report their readiness through a FIFO on fd 3.
+TRACER_READY_SETUP = """
+READY_FIFO=`mktemp -u`
+mkfifo "$READY_FIFO" || die
+exec 3<> "$READY_FIFO"
+rm -f "$READY_FIFO"
+"""
+
+WAIT_FOR_TRACERS = """
+echo -n "Waiting for {num_tracers} tracer(s) to become ready..."
+wait_for_tracers {num_tracers}
+echo ' ok.'
+"""
+
 SET_DSP = """
 echo "Setting processor {scheduling_core} to be the dedicated scheduling core."
 echo {scheduling_core} > /proc/litmus/release_master
@@ -144,19 +385,34 @@ then
 fi
 """
 
-DEBUG_TRACE = """
+DEBUG_TRACE = """{check}
 echo "Launching TRACE() debug tracer."
-LOG_FILE="debug_host=$(hostname)_scheduler=$(showsched)_trace={name}.log"
+LOG_FILE="debug_host=$(hostname)_scheduler=$(showsched)_trace={name}.log{suffix}"
 # Check environmental variable
 if ! [ -z "$KEEP_DEBUG_LOGS" ]
 then
     # Keep a copy of the old log if we are debugging.
     [ -e $LOG_FILE ] && backup_file $LOG_FILE
 fi
-{taskset}cat /dev/litmus/log > $LOG_FILE &
+DEBUG_OUT=`mktemp`
+{taskset}{capture} 2> >(tracer_ready_relay "$DEBUG_OUT" {tracer}) &
 TRACERS="$TRACERS $!"
 """
 
+# cat reports nothing, so announce readiness once the log has been opened.
+DEBUG_LOG_CAT = "bash -c 'exec < /dev/litmus/log && echo \"Waiting for SIGUSR1...\" >&2 && exec cat' > \"$LOG_FILE\""
+
+DEBUG_LOG_CAPTURE = "logcapture.py {options} /dev/litmus/log \"$LOG_FILE\""
+
+LOGCAPTURE_CHECK = """
+# Make sure we have access to the debug log capture helper
+which logcapture.py > /dev/null
+if [ "$?" -ne 0 ]
+then
+    echo "Cannot find logcapture.py in PATH"
+    die
+fi"""
+
 OVERHEAD_TRACE = """
 # Make sure we have access to the ft-trace-overheads wrapper script
 which ft-trace-overheads > /dev/null
@@ -165,15 +421,10 @@ then
     echo "Cannot find ft-trace-overheads in PATH"
     die
 fi
-echo -n "Launching Feather-Trace overhead tracer..."
+echo "Launching Feather-Trace overhead tracer."
 FT_OUT=`mktemp`
-{taskset}ft-trace-overheads -s {name} > "$FT_OUT" &
+{taskset}ft-trace-overheads -s {name} > >(tracer_ready_relay "$FT_OUT" ft-trace-overheads) &
 TRACERS="$TRACERS $!"
-while ! grep -q 'Waiting for SIGUSR1' "$FT_OUT"
-do
-    sleep 0.1
-done
-echo ' ok.'
 """
 
 PROCESS_OVERHEAD_TRACE = """
@@ -216,7 +467,7 @@ echo -n "Moving aggregated sample files to $(pwd)/overhead-samples ..."
 mkdir -p overhead-samples/ >> overhead-processing.log 2>&1 || fail
 mv -v overheads_host=*_trace={name}_{{msg,cpu}}=*_overhead=*.float32 overhead-samples/ >>  overhead-processing.log 2>&1 || fail
 echo " ok."
-echo "Hint: run ft-compute-stats combined-overheads_*.float32 > stats.csv to obtain summary statistics."
+echo "Hint: run ovstats.py -o stats.csv (or ft-compute-stats combined-overheads_*.float32 > stats.csv) to obtain summary statistics."
 """
 
 CLEAN_UP_RAW_FILES = """
@@ -233,20 +484,16 @@ then
     echo "Cannot find st_trace in PATH"
     die
 fi
-echo -n "Launching sched_trace schedule tracer..."
+echo "Launching sched_trace schedule tracer."
 ST_OUT=`mktemp`
-{taskset}st_trace -s {name} > "$ST_OUT" &
+{taskset}st_trace -s {name} > >(tracer_ready_relay "$ST_OUT" st_trace) &
 TRACERS="$TRACERS $!"
-while ! grep -q 'Waiting for SIGUSR1' "$ST_OUT"
-do
-    sleep 0.1
-done
-echo ' ok.'
 """
 
-SET_AFFINITY_MASK = "taskset 0x{affinity_mask:x} "
 SET_AFFINITY = "taskset -c {core_list} "
 
+DEFINE_AFFINITY = "core_list {var} {ranges}\n"
+
 TASK_LAUNCH_PREFIX = """
 echo -n "Launching {num_tasks} real-time tasks..."
 """
@@ -266,6 +513,30 @@ RTPID="$RTPID $!"
 RTPID="$RTPID $!"
 """
 
+# Task manifest entries for launcher.py: timeout (0 = none), then the command.
+RTSPIN_ENTRY = """# Task {tid}
+0 {taskset}rtspin -w -s {scale} {partition} {prio} {reservation} {wss} {timer} {cost:.2f} {period:.2f} $DURATION
+"""
+
+RT_LAUNCH_ENTRY = """# Task {tid}
+$DURATION {taskset}rt_launch -w {partition} {prio} {reservation} {cost:.2f} {period:.2f} -- {cmd}
+"""
+
+BATCH_LAUNCH_PREFIX = """
+# Make sure we have access to the batch launcher
+which launcher.py > /dev/null
+if [ "$?" -ne 0 ]
+then
+    echo "Cannot find launcher.py in PATH"
+    die
+fi
+launcher.py <<END_OF_TASKS &
+"""
+
+BATCH_LAUNCH_SUFFIX = """END_OF_TASKS
+RTPID="$RTPID $!"
+"""
+
 TASK_LAUNCH_SUFFIX = """
 # Wait for tasks to finish launching
 release_ts -W {num_tasks}
@@ -291,3 +562,50 @@ do
 done
 echo " ok."
 """
+
+INTERFERENCE_WORKLOAD = """
+# Background workload according to interference profile {profile}
+declare -A BG_WSS_OF_CORE=({core_wss})
+declare -A BG_COUNT_OF_CORE=({core_count})
+declare -A BG_WSS_OF_SOCKET=({socket_wss})
+declare -A BG_COUNT_OF_SOCKET=({socket_count})
+BG_EXCLUDE=" {exclude} "
+
+function llc_pages()
+{{
+    # Store $2 percent of the last-level cache of CPU $1, in 4K pages, in $3.
+    local F SIZE=""
+    for F in /sys/devices/system/cpu/cpu$1/cache/index*/size
+    do
+        [ -e "$F" ] && read SIZE < "$F"
+    done
+    if [ -z "$SIZE" ]
+    then
+        echo "Cannot determine the last-level cache size of CPU $1."
+        die
+    fi
+    SIZE=${{SIZE%K}}
+    printf -v "$3" '%d' $(( SIZE * $2 / 100 / 4 ))
+}}
+
+echo -n "Launching background tasks..."
+NUM_BG=0
+for (( I=0; I<${{#CORE[@]}}; I++ ))
+do
+    [[ "$BG_EXCLUDE" == *" $I "* ]] && continue
+    S=${{SOCKET_OF[$I]}}
+    WSS=${{BG_WSS_OF_CORE[$I]:-${{BG_WSS_OF_SOCKET[$S]:-{default_wss}}}}}
+    COUNT=${{BG_COUNT_OF_CORE[$I]:-${{BG_COUNT_OF_SOCKET[$S]:-{default_count}}}}}
+    if [[ "$WSS" == *% ]]
+    then
+        llc_pages ${{CORE[$I]}} ${{WSS%\\%}} WSS
+    fi
+    for (( J=0; J<COUNT; J++ ))
+    do
+        taskset -c ${{CORE[$I]}} nice rtspin -B -m $WSS &
+        BG_TASKS="$BG_TASKS $!"
+        NUM_BG=$((NUM_BG + 1))
+    done
+done
+echo " $NUM_BG tasks, ok."
+"""
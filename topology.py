@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# The generated scripts number cores logically: ${CORE[i]} is the i-th CPU
+# when CPUs are grouped by socket, in the order in which the scripts'
+# runtime discovery encounters them (sockets and CPU directories sorted by
+# name). A topology records this mapping so that it can be resolved when
+# scripts are generated instead of every time they run.
+
+import argparse
+import json
+import re
+import sys
+
+from glob import glob
+from os.path import isdir, join, basename
+
+SYSFS_CPU_ROOT = '/sys/devices/system/cpu'
+
+class Topology(object):
+    def __init__(self, cpus):
+        "cpus: (cpu_dir_name, socket_id) pairs in discovery order"
+        self.cpus = list(cpus)
+
+        # sockets sorted as strings, like `sort | uniq` in the scripts
+        socket_ids = sorted(set(str(s) for (_, s) in self.cpus))
+        self.cores   = []
+        self.sockets = []
+        for s in socket_ids:
+            for (name, sock) in self.cpus:
+                if str(sock) == s:
+                    self.cores.append(int(re.search(r'\d+', name).group()))
+                    self.sockets.append(int(s))
+
+    def __len__(self):
+        return len(self.cores)
+
+    def socket_sizes(self, m=None):
+        """number of logical cores per socket, considering only the first m
+        logical cores"""
+        sockets = self.sockets[:m] if m else self.sockets
+        sizes = []
+        for (i, s) in enumerate(sockets):
+            if i == 0 or s != sockets[i - 1]:
+                sizes.append(0)
+            sizes[-1] += 1
+        return sizes
+
+    def signature(self):
+        "what the generated scripts observe at runtime"
+        return ' '.join('%s:%s' % cpu for cpu in self.cpus)
+
+    def to_json(self):
+        return json.dumps({'cpus' : self.cpus}, indent=4)
+
+def read_sysfs(root=SYSFS_CPU_ROOT):
+    "read the topology from a sysfs-like directory tree"
+    cpus = []
+    for fname in sorted(glob(join(root, '*', 'topology', 'physical_package_id'))):
+        name = basename(fname[:-len('/topology/physical_package_id')])
+        socket = int(open(fname).read().strip())
+        cpus.append((name, socket))
+    if not cpus:
+        raise IOError('no CPU topology found in %s' % root)
+    return Topology(cpus)
+
+def load_topology(path):
+    "read a topology from a sysfs-like directory or a saved topology file"
+    if isdir(path):
+        return read_sysfs(path)
+    else:
+        data = json.load(open(path, 'r'))
+        return Topology((str(name), int(s)) for (name, s) in data['cpus'])
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Save or show the CPU topology assumed by generated scripts')
+
+    p.add_argument(
+        '--root', type=str, dest='root', default=SYSFS_CPU_ROOT,
+        help='sysfs-like directory or saved topology file to read '
+             '[default: %s]' % SYSFS_CPU_ROOT)
+    p.add_argument(
+        '--save', type=str, dest='save', default=None,
+        help='save the topology to this file')
+
+    return p.parse_args()
+
+def main(args=sys.argv[1:]):
+    options = parse_args()
+
+    try:
+        topo = load_topology(options.root)
+    except IOError, err:
+        print '%s: %s' % (options.root, err)
+        return
+    except ValueError, err:
+        print '%s: %s' % (options.root, err)
+        return
+
+    if options.save:
+        f = open(options.save, 'w')
+        f.write(topo.to_json())
+        f.close()
+        print '%d cores => %s' % (len(topo), options.save)
+    else:
+        for (i, (cpu, s)) in enumerate(zip(topo.cores, topo.sockets)):
+            print 'CORE[%d] = cpu%d (socket %d)' % (i, cpu, s)
+
+if __name__ == '__main__':
+    main()